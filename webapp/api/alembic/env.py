@@ -1,3 +1,10 @@
+from logging.config import fileConfig
+
+from sqlalchemy import engine_from_config
+from sqlalchemy import pool
+
+from alembic import context
+
 import os
 import sys
 from pathlib import Path
@@ -0,0 +1,43 @@
+"""add messages replies_count
+
+Revision ID: 3f1c2a9b7d41
+Revises: a40c6e2f9d13
+Create Date: 2026-10-17 09:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d41'
+down_revision: Union[str, None] = 'a40c6e2f9d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'messages',
+        sa.Column('replies_count', sa.Integer(), nullable=False, server_default='0')
+    )
+    # Backfill counters for existing threads
+    op.execute(
+        """
+        UPDATE messages AS parent
+        SET replies_count = counts.replies_count
+        FROM (
+            SELECT parent_id, COUNT(*) AS replies_count
+            FROM messages
+            WHERE parent_id IS NOT NULL
+            GROUP BY parent_id
+        ) AS counts
+        WHERE parent.id = counts.parent_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'replies_count')
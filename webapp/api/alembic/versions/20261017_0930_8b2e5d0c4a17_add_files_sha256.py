@@ -0,0 +1,29 @@
+"""add files sha256
+
+Revision ID: 8b2e5d0c4a17
+Revises: 3f1c2a9b7d41
+Create Date: 2026-10-17 09:30:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e5d0c4a17'
+down_revision: Union[str, None] = '3f1c2a9b7d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing files keep a NULL hash and their own per-upload path
+    op.add_column('files', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_files_sha256'), 'files', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_files_sha256'), table_name='files')
+    op.drop_column('files', 'sha256')
@@ -0,0 +1,46 @@
+"""add message access indexes
+
+Revision ID: e5a7c93d1f28
+Revises: 8b2e5d0c4a17
+Create Date: 2026-10-17 10:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c93d1f28'
+down_revision: Union[str, None] = '8b2e5d0c4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+INDEXES = [
+    ('ix_messages_channel_id_created_at_id', 'messages', ['channel_id', 'created_at', 'id']),
+    ('ix_messages_parent_id_created_at', 'messages', ['parent_id', 'created_at']),
+    ('ix_reactions_message_id_emoji', 'reactions', ['message_id', 'emoji']),
+    ('ix_files_message_id', 'files', ['message_id']),
+    ('ix_channel_members_channel_id_user_id', 'channel_members', ['channel_id', 'user_id']),
+]
+
+
+def upgrade() -> None:
+    # Build concurrently so large tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+        # Covered by ix_messages_parent_id_created_at
+        op.drop_index('ix_messages_parent_id', table_name='messages',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_parent_id', 'messages', ['parent_id'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
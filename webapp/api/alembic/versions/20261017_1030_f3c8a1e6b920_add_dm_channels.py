@@ -0,0 +1,62 @@
+"""add dm channels
+
+Revision ID: f3c8a1e6b920
+Revises: e5a7c93d1f28
+Create Date: 2026-10-17 10:30:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1e6b920'
+down_revision: Union[str, None] = 'e5a7c93d1f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'dm_channels',
+        sa.Column('user_low_id', sa.Integer(), nullable=False),
+        sa.Column('user_high_id', sa.Integer(), nullable=False),
+        sa.Column('channel_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.CheckConstraint('user_low_id <= user_high_id', name='ck_dm_channels_ordered_pair'),
+        sa.ForeignKeyConstraint(['user_low_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_high_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_low_id', 'user_high_id'),
+        sa.UniqueConstraint('channel_id')
+    )
+    # Backfill from existing DM_<a>_<b> channels by matching both usernames
+    # against the name, so a DM keeps its pair after a participant leaves.
+    # Usernames may contain underscores; if a name splits more than one
+    # way, prefer the pair that is still subscribed to the channel.
+    op.execute(
+        """
+        INSERT INTO dm_channels (user_low_id, user_high_id, channel_id, created_at)
+        SELECT DISTINCT ON (c.id)
+            LEAST(a.id, b.id), GREATEST(a.id, b.id), c.id, c.created_at
+        FROM channels AS c
+        JOIN users AS a ON left(c.name, length(a.username) + 4) = 'DM_' || a.username || '_'
+        JOIN users AS b ON b.username = substr(c.name, length(a.username) + 5)
+        WHERE c.name LIKE 'DM\\_%'
+        ORDER BY c.id, (
+            SELECT COUNT(*) FROM channel_members AS cm
+            WHERE cm.channel_id = c.id AND cm.user_id IN (a.id, b.id)
+        ) DESC
+        ON CONFLICT DO NOTHING
+        """
+    )
+    # Public listings rely on is_private alone to hide DMs
+    op.execute(
+        "UPDATE channels SET is_private = true WHERE id IN (SELECT channel_id FROM dm_channels)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('dm_channels')
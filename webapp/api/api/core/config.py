@@ -1,6 +1,9 @@
 """Configuration settings for the application."""
 
+import os
+import socket
 from typing import Optional, List
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -13,6 +16,17 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Max age of a cached token -> user lookup
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    # Max age of a cached user -> channel ids set. Writes invalidate the local
+    # worker at once, and with the redis backend every other worker too; with
+    # the memory backend other workers may see the old set for up to this long.
+    MEMBERSHIP_CACHE_TTL_SECONDS: int = 60
+    MEMBERSHIP_CACHE_MAX_SIZE: int = 10000
+    MEMBERSHIP_CACHE_BACKEND: str = "redis"  # "redis" (invalidated on all workers) or "memory"
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost factor for new password hashes
+    PASSWORD_HASH_WORKERS: int = 4  # Threads used for bcrypt hashing/verification
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 32  # Hash calls queued or running at once
 
     # Database
     DATABASE_URL: str = "postgresql://postgres:postgres@db:5432/chat_db"
@@ -21,10 +35,43 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "chat_db"
+    DB_POOL_SIZE: int = 10  # Connections kept open per process
+    DB_MAX_OVERFLOW: int = 20  # Extra connections allowed under burst load
+    DB_POOL_TIMEOUT: float = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Replace connections older than this (seconds)
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements; 0 behind pgbouncer
+    DATABASE_REPLICA_URLS: List[str] = []  # Read replicas for get_read_db
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # Replicas further behind are skipped
+    REPLICA_LAG_CHECK_SECONDS: float = 5.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # Reads stay on the primary this long after a write
+    READ_YOUR_WRITES_BACKEND: str = "redis"  # "redis" (shared by all workers) or "memory"
+
+    # Internal endpoints (metrics) are served only when this is set, and
+    # requests must send it as X-Internal-Token
+    INTERNAL_API_TOKEN: Optional[str] = None
 
     # Redis
     REDIS_HOST: str = "redis"
     REDIS_PORT: str = "6379"
+    REDIS_MAX_CONNECTIONS: int = 50
+
+    # Realtime server instance
+    SERVER_ID: str = Field(default_factory=lambda: f"{socket.gethostname()}-{os.getpid()}")
+    # "channel": every node subscribes to channel:{id} topics and filters locally
+    # "node": publish only to server:{id} topics of nodes with channel members
+    REALTIME_ROUTING: str = "channel"
+    CHANNEL_HISTORY_SIZE: int = 1000  # Approximate stream length kept per channel
+    WS_BATCH_FLUSH_MS: int = 20  # Flush window for clients that opt into batched frames
+    WS_BATCH_MAX_FLUSH_MS: int = 250
+    HEALTH_CHECK_INTERVAL_SECONDS: int = 10
+    SERVER_HEALTH_TTL_SECONDS: int = 30  # A node missing its heartbeat this long is dead
+    WS_PING_TIMEOUT_SECONDS: float = 5.0
+    REAPER_BATCH_SIZE: int = 500  # Users purged per Redis pipeline
+
+    # Presence
+    PRESENCE_BACKEND: str = "redis"  # "redis" or "memory"
+    PRESENCE_TIMEOUT_SECONDS: int = 5  # Users seen within this window are online
 
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
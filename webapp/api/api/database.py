@@ -1,32 +1,285 @@
 """Database configuration and session management."""
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import jwt
+import redis.asyncio as aioredis
+from fastapi.requests import HTTPConnection
+from jwt.exceptions import InvalidTokenError
+from redis.exceptions import RedisError
+from sqlalchemy import event, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .core.config import settings
+from .utils.cache import TTLCache
+from .utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+def get_async_database_url(url: str) -> URL:
+    """Build the asyncpg URL for a configured Postgres URL.
+
+    Accepts any postgres/postgresql URL, with or without a driver, and
+    carries the statement cache size over to SQLAlchemy's asyncpg dialect.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() in ("postgres", "postgresql"):
+        parsed = parsed.set(drivername="postgresql+asyncpg").update_query_dict(
+            {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+        )
+    return parsed
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited.
+
+    Each engine's pool keeps its own wait histogram and timeout count.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = Histogram()
+        self.timeouts = 0
+
+    def recreate(self):
+        # Keep the metrics when the engine replaces its pool (e.g. on dispose)
+        pool = super().recreate()
+        pool.wait_histogram = self.wait_histogram
+        pool.timeouts = self.timeouts
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_histogram.observe(time.perf_counter() - started)
+
+def create_pooled_engine(url: str) -> AsyncEngine:
+    """Create an async engine with the configured pool settings."""
+    return create_async_engine(
+        get_async_database_url(url),
+        echo=False,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+
+def _engine_pool_stats(pool) -> Dict[str, Any]:
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "timeouts": pool.timeouts,
+        "wait_seconds": pool.wait_histogram.snapshot(),
+    }
 
 # Create async SQLAlchemy engine
-engine = create_async_engine(
-    settings.DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://'),
-    echo=False,
+engine = create_pooled_engine(settings.DATABASE_URL)
+
+class PrimarySession(Session):
+    """Session bound to the primary; remembers which users just wrote."""
+
+# Users (by token subject) whose reads stay on the primary after a write.
+# This worker's writers are remembered locally; with the redis backend the
+# marker is also shared so reads on other workers see it.
+recent_writers: TTLCache[bool] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE,
+    ttl=settings.READ_YOUR_WRITES_SECONDS
 )
+writer_marker_client: Optional[aioredis.Redis] = None
+if settings.DATABASE_REPLICA_URLS and settings.READ_YOUR_WRITES_BACKEND == "redis":
+    writer_marker_client = aioredis.Redis(
+        host=settings.REDIS_HOST,
+        port=int(settings.REDIS_PORT),
+        db=0,
+        decode_responses=True
+    )
+
+def _writer_key(writer: str) -> str:
+    return f"read_your_writes:{writer}"
+
+async def mark_recent_writer(writer: str) -> None:
+    """Keep a user's reads on the primary for READ_YOUR_WRITES_SECONDS."""
+    recent_writers.set(writer, True)
+    if writer_marker_client is None:
+        return
+    try:
+        await writer_marker_client.set(
+            _writer_key(writer), 1, px=int(settings.READ_YOUR_WRITES_SECONDS * 1000)
+        )
+    except RedisError as e:
+        logger.error(f"Redis error marking recent writer {writer}: {e}")
+
+async def is_recent_writer(writer: str) -> bool:
+    """Check whether a user wrote recently on any worker."""
+    if recent_writers.get(writer):
+        return True
+    if writer_marker_client is None:
+        return False
+    try:
+        return bool(await writer_marker_client.exists(_writer_key(writer)))
+    except RedisError as e:
+        # Can't tell, so keep the read consistent
+        logger.error(f"Redis error checking recent writer {writer}: {e}")
+        return True
+
+@event.listens_for(PrimarySession, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _flag_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+class PrimaryAsyncSession(AsyncSession):
+    """Async session on the primary that records its writer on commit.
+
+    The marker is stored before commit returns, so it is in place before
+    the response reaches the client.
+    """
+
+    async def commit(self) -> None:
+        await super().commit()
+        info = self.sync_session.info
+        writer = info.get("writer")
+        if info.pop("wrote", False) and writer:
+            await mark_recent_writer(writer)
 
 # Create async SessionLocal class
 AsyncSessionLocal = sessionmaker(
     engine,
-    class_=AsyncSession,
+    class_=PrimaryAsyncSession,
+    sync_session_class=PrimarySession,
     expire_on_commit=False,
 )
 
+class Replica:
+    """A read replica engine and its last measured replication lag."""
+
+    LAG_QUERY = text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+
+    def __init__(self, url: str):
+        self.engine = create_pooled_engine(url)
+        self.session_maker = sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False, info={"replica": True}
+        )
+        self.lag: Optional[float] = None  # None until measured, or after a failed check
+        self.checked_at = 0.0
+        self._check: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    def refresh_if_stale(self) -> None:
+        """Re-measure lag in the background once the last reading is too old."""
+        stale = time.monotonic() - self.checked_at >= settings.REPLICA_LAG_CHECK_SECONDS
+        if stale and (self._check is None or self._check.done()):
+            self._check = asyncio.create_task(self.refresh())
+
+    async def refresh(self) -> None:
+        try:
+            async with self.engine.connect() as conn:
+                lag = (await conn.execute(self.LAG_QUERY)).scalar()
+            self.lag = float(lag or 0)
+        except Exception as e:
+            logger.warning(f"Replica lag check failed for {self.engine.url.host}: {e}")
+            self.lag = None
+        self.checked_at = time.monotonic()
+
+def is_replica_session(session: AsyncSession) -> bool:
+    """Whether a session reads from a replica, whose data may lag the primary."""
+    return session.info.get("replica", False)
+
+replicas: List[Replica] = [Replica(url) for url in settings.DATABASE_REPLICA_URLS]
+_replica_cycle = itertools.cycle(replicas)
+
+async def get_read_session_maker(writer: Optional[str] = None) -> sessionmaker:
+    """Pick a session factory for a read-only request.
+
+    Users who wrote within READ_YOUR_WRITES_SECONDS read from the primary.
+    Otherwise replicas are used round-robin; a replica that is unmeasured,
+    unreachable or lagging more than REPLICA_MAX_LAG_SECONDS is skipped,
+    falling back to the primary.
+    """
+    if not replicas or (writer and await is_recent_writer(writer)):
+        return AsyncSessionLocal
+    for _ in range(len(replicas)):
+        replica = next(_replica_cycle)
+        replica.refresh_if_stale()
+        if replica.healthy:
+            return replica.session_maker
+    return AsyncSessionLocal
+
+def get_request_writer(request: HTTPConnection) -> Optional[str]:
+    """Get the bearer token subject used to key read-your-writes stickiness.
+
+    The signature is not checked: this only chooses a database, and the
+    route's own auth dependency still validates the token.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("sub")
+    except InvalidTokenError:
+        return None
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get live connection pool metrics."""
+    return {
+        **_engine_pool_stats(engine.pool),
+        "replicas": [
+            {
+                "host": replica.engine.url.host,
+                "lag_seconds": replica.lag,
+                "healthy": replica.healthy,
+                **_engine_pool_stats(replica.engine.pool),
+            }
+            for replica in replicas
+        ],
+    }
+
 # Create Base class
 Base = declarative_base()
 
 # Dependency
-async def get_db() -> AsyncSession:
+async def get_db(request: HTTPConnection) -> AsyncSession:
     """Get database session."""
     async with AsyncSessionLocal() as session:
+        session.sync_session.info["writer"] = get_request_writer(request)
+        try:
+            yield session
+        finally:
+            await session.close() 
+
+async def get_read_db(request: HTTPConnection) -> AsyncSession:
+    """Get a session for read-only handlers, on a replica when one is fit to serve."""
+    session_maker = await get_read_session_maker(get_request_writer(request))
+    async with session_maker() as session:
         try:
             yield session
         finally:
-            await session.close() 
\ No newline at end of file
+            await session.close()
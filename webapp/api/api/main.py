@@ -8,6 +8,7 @@ from api.routes.channel import router as channel_router
 from api.routes.messages import router as messages_router
 from api.routes.users import router as users_router
 from api.routes.files import router as files_router
+from api.routes.internal import router as internal_router
 
 app = FastAPI()
 
@@ -26,6 +27,7 @@ app.include_router(channel_router, prefix="/api/v1")
 app.include_router(messages_router, prefix="/api/v1")
 app.include_router(users_router, prefix="/api/v1")
 app.include_router(files_router, prefix="/api/v1")
+app.include_router(internal_router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
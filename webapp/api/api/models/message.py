@@ -34,7 +34,8 @@ class Message(MessageBase):
     updated_at: datetime
     user_id: int  # Override to make required in response
     username: str
-    emojis: Dict[str, List[str]] = {}  # {emoji: [usernames]}
+    emojis: Dict[str, List[str]] = {}  # {emoji: [usernames]}, capped sample
+    emoji_counts: Dict[str, int] = {}  # {emoji: total reactions}
     file: Optional[FileInfo] = None  # File information if this is a file message
     
     # Thread-related fields
@@ -47,4 +48,10 @@ class Message(MessageBase):
         from_attributes = True
         orm_mode = True  # Enable ORM mode 
 
-Message.model_rebuild()  # Update forward refs 
\ No newline at end of file
+Message.model_rebuild()  # Update forward refs
+
+class MessagePage(BaseModel):
+    """Paginated message list model."""
+    messages: List[Message] = []
+    next_cursor: Optional[int] = None  # Pass as after_id to load newer messages
+    prev_cursor: Optional[int] = None  # Pass as before_id to load older messages 
\ No newline at end of file
@@ -5,11 +5,13 @@ from .channel import Channel
 from .message import Message
 from .reaction import Reaction
 from .file import File
+from .dm_channel import DMChannel
 
 __all__ = [
     "User",
     "Channel",
     "Message",
     "Reaction",
-    "File"
+    "File",
+    "DMChannel"
 ] 
\ No newline at end of file
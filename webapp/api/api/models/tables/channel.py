@@ -1,7 +1,7 @@
 """SQLAlchemy Channel model."""
 
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Table, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, Table, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from ...database import Base
@@ -11,7 +11,9 @@ channel_members = Table(
     'channel_members',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('channel_id', Integer, ForeignKey('channels.id'), primary_key=True)
+    Column('channel_id', Integer, ForeignKey('channels.id'), primary_key=True),
+    # The primary key leads with user_id; member lookups by channel need this
+    Index('ix_channel_members_channel_id_user_id', 'channel_id', 'user_id')
 )
 
 class Channel(Base):
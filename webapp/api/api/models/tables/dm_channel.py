@@ -0,0 +1,33 @@
+"""SQLAlchemy DM channel model."""
+
+from datetime import datetime
+from typing import Tuple
+from sqlalchemy import CheckConstraint, Column, DateTime, Integer, ForeignKey
+from sqlalchemy.orm import relationship
+
+from ...database import Base
+
+class DMChannel(Base):
+    """Direct message channel between two users.
+
+    Keyed by the ordered user-id pair, so resolving a DM is a primary key
+    lookup rather than a search by channel name.
+    """
+    __tablename__ = "dm_channels"
+
+    user_low_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    user_high_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    channel_id = Column(Integer, ForeignKey("channels.id", ondelete="CASCADE"), nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    channel = relationship("Channel")
+
+    __table_args__ = (
+        CheckConstraint('user_low_id <= user_high_id', name='ck_dm_channels_ordered_pair'),
+    )
+
+    @staticmethod
+    def key(user_id: int, other_user_id: int) -> Tuple[int, int]:
+        """Get the (user_low_id, user_high_id) key for two users."""
+        return min(user_id, other_user_id), max(user_id, other_user_id)
@@ -1,7 +1,7 @@
 """SQLAlchemy Message model."""
 
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 
 from ...database import Base
@@ -14,7 +14,8 @@ class Message(Base):
     content = Column(Text, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     channel_id = Column(Integer, ForeignKey("channels.id"), nullable=False)
-    parent_id = Column(Integer, ForeignKey("messages.id"), nullable=True, index=True)
+    parent_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    replies_count = Column(Integer, nullable=False, default=0, server_default="0")  # Kept in sync on reply create/delete
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -26,4 +27,10 @@ class Message(Base):
     
     # Thread relationships
     parent_message = relationship("Message", remote_side=[id], back_populates="replies")
-    replies = relationship("Message", back_populates="parent_message", cascade="all, delete-orphan") 
\ No newline at end of file
+    replies = relationship("Message", back_populates="parent_message", cascade="all, delete-orphan")
+
+    # Channel pages and threads filter on one column and order by created_at
+    __table_args__ = (
+        Index('ix_messages_channel_id_created_at_id', 'channel_id', 'created_at', 'id'),
+        Index('ix_messages_parent_id_created_at', 'parent_id', 'created_at'),
+    ) 
\ No newline at end of file
@@ -1,7 +1,7 @@
 """SQLAlchemy Reaction model."""
 
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from ...database import Base
@@ -23,4 +23,5 @@ class Reaction(Base):
     # Add unique constraint for user_id, message_id, and emoji combination
     __table_args__ = (
         UniqueConstraint('user_id', 'message_id', 'emoji', name='unique_user_message_emoji'),
+        Index('ix_reactions_message_id_emoji', 'message_id', 'emoji'),
     ) 
\ No newline at end of file
@@ -1,11 +1,11 @@
 """Channel routes."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from sqlalchemy import select
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models.channel import Channel, ChannelCreate
 from ..models.tables.user import User
 from ..models.tables.message import Message
@@ -13,10 +13,13 @@ from ..models.tables.reaction import Reaction as ReactionModel
 from ..models.reaction import Reaction, ReactionCreate
 from ..services.channel import ChannelService
 from ..routes.auth import get_current_user
-from ..services.auth import AuthService
 
 router = APIRouter(prefix="/channels", tags=["channels"])
 
+# Configure reaction pagination settings
+DEFAULT_REACTIONS_PAGE_SIZE = 100
+MAX_REACTIONS_PAGE_SIZE = 500
+
 @router.post("", response_model=Channel, status_code=status.HTTP_201_CREATED)
 async def create_channel(
     channel: ChannelCreate,
@@ -35,7 +38,7 @@ async def create_channel(
 @router.get("", response_model=List[Channel])
 async def get_channels(
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all public channels."""
     return await ChannelService.get_channels(db)
@@ -53,30 +56,12 @@ async def create_or_get_dm_channel(
     if not target_user:
         raise HTTPException(status_code=404, detail=f"User {target_username} not found")
 
-    # Generate DM channel name (alphabetically sorted usernames)
-    channel_name = f"DM_{sorted([current_user.username, target_username])[0]}_{sorted([current_user.username, target_username])[1]}"
-    
-    # Check if channel exists in user's channels
-    user_channels = await ChannelService.get_user_channels(db, current_user)
-    existing_channel = next((c for c in user_channels if c.name == channel_name), None)
-    
-    if existing_channel:
-        return existing_channel
-        
-    # Create new DM channel if it doesn't exist
-    return await ChannelService.create_channel(
-        db=db,
-        name=channel_name,
-        description=f"Direct messages between {current_user.username} and {target_username}",
-        created_by_user=current_user,
-        is_private=True,
-        members=[current_user, target_user]
-    )
+    return await ChannelService.get_or_create_dm_channel(db, current_user, target_user)
 
 @router.get("/me", response_model=List[Channel])
 async def get_my_channels(
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get channels where the current user is a member."""
     return await ChannelService.get_user_channels(db, current_user)
@@ -85,7 +70,7 @@ async def get_my_channels(
 async def get_channel(
     channel_id: int,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get a specific channel by ID."""
     return await ChannelService.get_channel(db, channel_id)
@@ -123,8 +108,7 @@ async def add_member(
     channel = await channel_service.get_channel(db, channel_id)
     
     # Get the user to add
-    auth_service = AuthService()
-    user_to_add = await auth_service.get_user(db, user_id)
+    user_to_add = await db.get(User, user_id)
     if not user_to_add:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,14 +130,7 @@ async def add_reaction(
     print(f"Adding/toggling reaction - Channel: {channel_id}, Message: {message_id}, Emoji: {emoji}, User: {current_user.username}")
     
     # Verify channel exists and user has access
-    channel = await ChannelService.get_channel(db, channel_id)
-    if not channel:
-        print(f"Channel {channel_id} not found")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Channel not found"
-        )
-    print(f"Channel {channel_id} found: {channel.name}")
+    await ChannelService.require_channel_access(db, current_user, channel_id)
     
     # Verify message exists and belongs to the channel
     message = await db.get(Message, message_id)
@@ -212,12 +189,7 @@ async def remove_reaction(
 ):
     """Remove a reaction from a message in a channel."""
     # Verify channel exists and user has access
-    channel = await ChannelService.get_channel(db, channel_id)
-    if not channel:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Channel not found"
-        )
+    await ChannelService.require_channel_access(db, current_user, channel_id)
     
     # Verify message exists and belongs to the channel
     message = await db.get(Message, message_id)
@@ -258,17 +230,19 @@ async def remove_reaction(
 async def get_message_reactions(
     channel_id: int,
     message_id: int,
+    emoji: Optional[str] = Query(None, description="Only return reactions with this emoji"),
+    after_id: Optional[int] = Query(None, description="Return reactions after this reaction ID"),
+    limit: int = Query(DEFAULT_REACTIONS_PAGE_SIZE, ge=1, le=MAX_REACTIONS_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all reactions for a message in a channel."""
+    """Get a page of reactions for a message in a channel.
+
+    Message lists only carry a capped sample of reactors per emoji; this
+    endpoint returns the full list, paged by reaction ID.
+    """
     # Verify channel exists and user has access
-    channel = await ChannelService.get_channel(db, channel_id)
-    if not channel:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Channel not found"
-        )
+    await ChannelService.require_channel_access(db, current_user, channel_id)
     
     # Verify message exists and belongs to the channel
     message = await db.get(Message, message_id)
@@ -278,13 +252,17 @@ async def get_message_reactions(
             detail="Message not found in this channel"
         )
     
-    # Get all reactions for the message with usernames
-    result = await db.execute(
+    # Get a page of reactions for the message with usernames
+    query = (
         select(ReactionModel, User.username)
         .join(User, ReactionModel.user_id == User.id)
         .where(ReactionModel.message_id == message_id)
-        .order_by(ReactionModel.created_at)
     )
+    if emoji is not None:
+        query = query.where(ReactionModel.emoji == emoji)
+    if after_id is not None:
+        query = query.where(ReactionModel.id > after_id)
+    result = await db.execute(query.order_by(ReactionModel.id).limit(limit))
     reactions_with_users = result.all()
     
     # Construct response with usernames
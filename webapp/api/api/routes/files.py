@@ -5,8 +5,12 @@ import shutil
 import uuid
 import logging
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from starlette.responses import FileResponse
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import aiofiles.os
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from uuid import UUID
@@ -17,6 +21,9 @@ from ..models.tables.file import File as FileTable
 from ..models.file import File as FileModel
 from ..models.tables.message import Message as MessageTable
 from ..routes.auth import get_current_user
+from ..services.channel import ChannelService
+from ..services.file import FileService
+from ..utils.files import content_disposition, parse_range_header, iter_file_range
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +31,28 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
+# Stored files are immutable, so clients may cache them for a year
+FILE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+async def get_accessible_file(db: AsyncSession, file_id: UUID, user: User) -> FileTable:
+    """Get a file the user may see: their own, or one posted in a channel they can access."""
+    result = await db.execute(
+        select(FileTable, MessageTable.channel_id)
+        .outerjoin(MessageTable, FileTable.message_id == MessageTable.id)
+        .where(FileTable.id == file_id)
+    )
+    row = result.first()
+    if not row:
+        logger.warning(f"File {file_id} not found in database")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    file, channel_id = row
+    if channel_id and file.user_id != user.id:
+        await ChannelService.require_channel_access(db, user, channel_id)
+    return file
+
 @router.get("/{file_id}/metadata", response_model=FileModel)
 async def get_file_metadata(
     file_id: UUID,
@@ -31,55 +60,96 @@ async def get_file_metadata(
     db: AsyncSession = Depends(get_db)
 ):
     """Get file metadata."""
-    file = await db.get(FileTable, str(file_id))
-    if not file:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="File not found"
-        )
-    return file
+    return await get_accessible_file(db, file_id, current_user)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+def not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    """Check whether a resource is unchanged since an If-Modified-Since date."""
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
 
 @router.get("/{file_id}")
 async def get_file(
     file_id: UUID,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Download a file."""
-    logger.info(f"Download request received for file_id: {file_id} by user: {current_user.username}")
-    
-    file = await db.get(FileTable, str(file_id))
-    logger.info(f"Database query result: {file.__dict__ if file else None}")
-    
-    if not file:
-        logger.warning(f"File {file_id} not found in database")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="File not found"
-        )
+    """Download a file.
+
+    Supports conditional requests (If-None-Match / If-Modified-Since) and
+    single byte ranges, so clients can revalidate and resume downloads.
+    """
+    file = await get_accessible_file(db, file_id, current_user)
     
     file_path = Path(file.filepath)
-    logger.info(f"Attempting to access file at: {file_path} (absolute: {file_path.absolute()})")
-    
-    if not file_path.exists():
+    try:
+        size = (await aiofiles.os.stat(file_path)).st_size
+    except FileNotFoundError:
         logger.error(f"File not found on disk at {file_path}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="File not found on disk"
         )
     
-    try:
-        return FileResponse(
-            path=str(file_path),
-            filename=file.filename,
-            media_type=file.content_type
-        )
-    except Exception as e:
-        logger.error(f"Error creating FileResponse: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error serving file: {str(e)}"
-        )
+    # File contents never change once stored, so the ETag can be derived
+    # from the content hash (or the file ID for files stored before hashing)
+    etag = f'"{file.sha256 or file.id}"'
+    last_modified = (file.created_at or datetime.utcnow()).replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": FILE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (if_none_match and etag_matches(if_none_match, etag)) or (
+        not if_none_match and if_modified_since and not_modified_since(if_modified_since, last_modified)
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Serve a partial response unless If-Range names a different version
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+                "Content-Disposition": content_disposition(file.filename),
+            })
+            return StreamingResponse(
+                iter_file_range(file_path, start, end),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=file.content_type,
+                headers=headers
+            )
+    
+    return FileResponse(
+        path=str(file_path),
+        filename=file.filename,
+        media_type=file.content_type,
+        headers=headers
+    )
 
 @router.delete("/{file_id}")
 async def delete_file(
@@ -88,7 +158,7 @@ async def delete_file(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a file."""
-    file = await db.get(FileTable, str(file_id))
+    file = await db.get(FileTable, file_id)
     if not file:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,12 +170,6 @@ async def delete_file(
             detail="Cannot delete another user's file"
         )
     
-    # Delete file from disk
-    file_path = Path(file.filepath)
-    if file_path.exists():
-        file_path.unlink()
-    
-    # Delete database record
-    await db.delete(file)
-    await db.commit()
+    # Delete database record, and the blob once nothing references it
+    await FileService.delete_file(db, file)
     return {"message": "File deleted successfully"} 
\ No newline at end of file
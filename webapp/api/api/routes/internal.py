@@ -0,0 +1,39 @@
+"""Internal routes for operators and monitoring."""
+
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from ..core.config import settings
+from ..database import get_pool_stats
+from ..services.auth import password_pool
+
+def verify_internal_token(x_internal_token: Optional[str] = Header(None)) -> None:
+    """Require X-Internal-Token to match INTERNAL_API_TOKEN.
+
+    Without a configured token the internal routes are not served at all.
+    """
+    expected = settings.INTERNAL_API_TOKEN
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(x_internal_token or "", expected):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid internal token"
+        )
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(verify_internal_token)]
+)
+
+@router.get("/metrics")
+async def get_metrics():
+    """Get live database pool and password hashing pool metrics."""
+    return {
+        "db_pool": get_pool_stats(),
+        "password_pool": password_pool.stats(),
+    }
@@ -5,30 +5,28 @@ import shutil
 import uuid
 import logging
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from sqlalchemy import select, text
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, text, tuple_
 import re
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models.tables.user import User
 from ..models.tables.message import Message as MessageTable
-from ..models.tables.reaction import Reaction as ReactionTable
 from ..models.tables.file import File as FileTable
-from ..models.tables.channel import Channel as ChannelTable, channel_members
-from ..models.message import Message, MessageCreate, FileInfo
+from ..models.tables.channel import channel_members
+from ..models.message import Message, MessageCreate, MessagePage
 from ..routes.auth import get_current_user
+from ..services.message import MessageService
+from ..services.channel import ChannelService
+from ..services.file import FileService
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
-# Configure upload settings
-UPLOAD_DIR = Path("uploads")
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Configure pagination settings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
 
 def extract_file_id(content: str) -> Optional[str]:
@@ -36,6 +34,23 @@ def extract_file_id(content: str) -> Optional[str]:
     match = re.search(r'\[file:([^\]]+)\]', content)
     return match.group(1) if match else None
 
+async def get_cursor_key(db: AsyncSession, channel_id: int, message_id: int):
+    """Get the (created_at, id) keyset position of a cursor message."""
+    result = await db.execute(
+        select(MessageTable.created_at, MessageTable.id)
+        .where(
+            MessageTable.id == message_id,
+            MessageTable.channel_id == channel_id
+        )
+    )
+    key = result.one_or_none()
+    if not key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: message {message_id} not found in this channel"
+        )
+    return tuple(key)
+
 @router.post("/", response_model=Message)
 async def create_message(
     content: str = Form(...),
@@ -46,6 +61,7 @@ async def create_message(
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new message with optional file attachment and thread support."""
+    db_file = None
     try:
         # Convert IDs to integers if provided
         channel_id_int = int(channel_id) if channel_id else None
@@ -61,39 +77,15 @@ async def create_message(
                 )
             channel_id_int = parent_message.channel_id
         
+        if channel_id_int:
+            await ChannelService.require_channel_access(db, current_user, channel_id_int)
+        
         # Handle file upload if present
-        db_file = None
         if file:
-            # Read file to check size
-            contents = await file.read()
-            if len(contents) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"File too large. Maximum size is {MAX_FILE_SIZE/1024/1024}MB"
-                )
-            
-            # Generate unique filename
-            original_extension = Path(file.filename).suffix
-            unique_filename = f"{uuid.uuid4()}{original_extension}"
-            file_path = UPLOAD_DIR / unique_filename
-            
-            # Save file
-            with open(file_path, "wb") as f:
-                f.write(contents)
-            
-            # Create file record without committing
-            db_file = FileTable(
-                filename=file.filename,
-                filepath=str(file_path),
-                content_type=file.content_type,
-                size=len(contents),
-                user_id=current_user.id
-            )
-            db.add(db_file)
-            await db.flush()  # Get file ID without committing
+            db_file = await FileService.store_upload(db, file, current_user)
             
             # Update content to include file reference
-            content = f"{content}\nUploaded file: {file.filename} ({len(contents)/1024:.1f} KB) [file:{db_file.id}]"
+            content = f"{content}\nUploaded file: {file.filename} ({db_file.size/1024:.1f} KB) [file:{db_file.id}]"
         
         # Create message
         db_message = MessageTable(
@@ -105,6 +97,10 @@ async def create_message(
         db.add(db_message)
         await db.flush()  # Get message ID without committing
         
+        # Keep the thread parent's reply counter in sync
+        if parent_id_int:
+            await MessageService.adjust_replies_count(db, parent_id_int, 1)
+        
         # Link file to message if present
         if db_file:
             db_file.message_id = db_message.id
@@ -141,8 +137,10 @@ async def create_message(
             
     except Exception as e:
         # Clean up file if saved
-        if 'file_path' in locals() and file_path.exists():
-            file_path.unlink()
+        if db_file:
+            await FileService.discard_upload(db, db_file.sha256, db_file.filepath)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -152,88 +150,34 @@ async def create_message(
 async def get_message(
     message_id: int,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get a specific message with its replies."""
-    # Query message with file and replies relationships
-    result = await db.execute(
-        select(MessageTable)
-        .where(MessageTable.id == message_id)
-        .options(
-            joinedload(MessageTable.file),
-            joinedload(MessageTable.replies).joinedload(MessageTable.file),
-            joinedload(MessageTable.replies).joinedload(MessageTable.reactions).joinedload(ReactionTable.user)
-        )
-    )
-    message = result.unique().scalar_one_or_none()
-    
+    message = await db.get(MessageTable, message_id)
     if not message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
+    if message.channel_id:
+        await ChannelService.require_channel_access(db, current_user, message.channel_id)
     
-    # Get the user and add username to the response
-    user = await db.get(User, message.user_id)
-    setattr(message, 'username', user.username if user else "System")
-    
-    # Add file info if present
-    if message.file:
-        setattr(message, 'file', FileInfo(
-            id=str(message.file.id),  # Convert UUID to string
-            filename=message.file.filename,
-            size=message.file.size,
-            content_type=message.file.content_type
-        ))
-    else:
-        setattr(message, 'file', None)
-    
-    # Initialize empty emojis dict
-    setattr(message, 'emojis', {})
-    
-    # Process replies
-    replies = []
-    for reply in message.replies:
-        reply_user = await db.get(User, reply.user_id)
-        reply_username = reply_user.username if reply_user else "System"
-        
-        # Format reactions for reply
-        emoji_data = {}
-        for reaction in reply.reactions:
-            if reaction.emoji not in emoji_data:
-                emoji_data[reaction.emoji] = []
-            if reaction.user:
-                emoji_data[reaction.emoji].append(reaction.user.username)
-        
-        reply_data = {
-            "id": reply.id,
-            "content": reply.content,
-            "channel_id": reply.channel_id,
-            "user_id": reply.user_id,
-            "created_at": reply.created_at,
-            "updated_at": reply.updated_at,
-            "username": reply_username,
-            "emojis": emoji_data,
-            "file": None,
-            "parent_id": reply.parent_id,
-            "parent_message": None
-        }
-        
-        # Add file info if present
-        if reply.file:
-            reply_data["file"] = {
-                "id": str(reply.file.id),
-                "filename": reply.file.filename,
-                "size": reply.file.size,
-                "content_type": reply.file.content_type
-            }
-        
-        replies.append(Message(**reply_data))
+    result = await db.execute(
+        select(MessageTable)
+        .where(MessageTable.parent_id == message_id)
+        .order_by(MessageTable.created_at, MessageTable.id)
+    )
+    replies = result.scalars().all()
     
-    setattr(message, 'replies', replies)
-    setattr(message, 'replies_count', len(replies))
+    # Hydrate the message and its replies together
+    hydrated = await MessageService.hydrate_messages(
+        db, [message, *replies], viewer_id=current_user.id
+    )
+    response_message = hydrated[0]
+    response_message.replies = hydrated[1:]
+    response_message.replies_count = len(replies)
     
-    return message
+    return response_message
 
 @router.delete("/{message_id}")
 async def delete_message(
@@ -253,150 +197,106 @@ async def delete_message(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Cannot delete another user's message"
         )
+    if message.parent_id:
+        await MessageService.adjust_replies_count(db, message.parent_id, -1)
     await db.delete(message)
     await db.commit()
     return {"message": "Message deleted successfully"}
 
-@router.get("/channel/{channel_id}", response_model=List[Message])
+@router.get("/channel/{channel_id}", response_model=MessagePage)
 async def get_channel_messages(
     channel_id: int,
+    before_id: Optional[int] = Query(None, description="Return messages older than this message"),
+    after_id: Optional[int] = Query(None, description="Return messages newer than this message"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all messages in a channel."""
-    # Query messages with reactions, users, and files
-    result = await db.execute(
-        select(MessageTable)
-        .where(MessageTable.channel_id == channel_id)
-        .options(
-            joinedload(MessageTable.reactions).joinedload(ReactionTable.user),
-            joinedload(MessageTable.file),
-            joinedload(MessageTable.replies)
+    """Get a page of messages in a channel.
+
+    Pages are keyed on (created_at, id). Without a cursor the most recent
+    messages are returned. Messages are always returned oldest first.
+    """
+    if before_id is not None and after_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before_id or after_id, not both"
         )
-        .order_by(MessageTable.created_at)
+
+    await ChannelService.require_channel_access(db, current_user, channel_id)
+
+    page_key = tuple_(MessageTable.created_at, MessageTable.id)
+    query = select(MessageTable).where(MessageTable.channel_id == channel_id)
+    if after_id is not None:
+        cursor_key = await get_cursor_key(db, channel_id, after_id)
+        query = (
+            query.where(page_key > tuple_(*cursor_key))
+            .order_by(MessageTable.created_at, MessageTable.id)
+        )
+    else:
+        if before_id is not None:
+            cursor_key = await get_cursor_key(db, channel_id, before_id)
+            query = query.where(page_key < tuple_(*cursor_key))
+        query = query.order_by(MessageTable.created_at.desc(), MessageTable.id.desc())
+
+    # Fetch one extra row to find out whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    messages = list(result.scalars().all())
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if after_id is None:
+        messages.reverse()
+    
+    response_messages = await MessageService.hydrate_messages(
+        db, messages, viewer_id=current_user.id
     )
-    messages = result.unique().scalars().all()
     
-    # Process each message
-    response_messages = []
-    for message in messages:
-        # Get message author's username
-        user = await db.get(User, message.user_id)
-        username = user.username if user else "System"
-        
-        # Format reactions as {emoji: [usernames]}
-        emoji_data = {}
-        for reaction in message.reactions:
-            if reaction.emoji not in emoji_data:
-                emoji_data[reaction.emoji] = []
-            if reaction.user:
-                emoji_data[reaction.emoji].append(reaction.user.username)
-        
-        # Prepare message data
-        message_data = {
-            "id": message.id,
-            "content": message.content,
-            "channel_id": message.channel_id,
-            "user_id": message.user_id,
-            "created_at": message.created_at,
-            "updated_at": message.updated_at,
-            "username": username,
-            "emojis": emoji_data,
-            "file": None,
-            "parent_id": message.parent_id,
-            "replies_count": len(message.replies)
-        }
-        
-        # Add file info if present
-        if message.file:
-            message_data["file"] = {
-                "id": str(message.file.id),
-                "filename": message.file.filename,
-                "size": message.file.size,
-                "content_type": message.file.content_type
-            }
-        
-        response_messages.append(Message(**message_data))
+    # Cursors point at the edge messages of this page
+    next_cursor = None
+    prev_cursor = None
+    if messages:
+        if after_id is not None:
+            next_cursor = messages[-1].id if has_more else None
+            prev_cursor = messages[0].id
+        else:
+            next_cursor = messages[-1].id if before_id is not None else None
+            prev_cursor = messages[0].id if has_more else None
     
-    return response_messages 
+    return MessagePage(
+        messages=response_messages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
 
 @router.get("/thread/{message_id}", response_model=List[Message])
 async def get_thread_messages(
     message_id: int,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all messages in a thread."""
-    # Query messages with reactions, users, files, and parent messages
+    parent_message = await db.get(MessageTable, message_id)
+    if parent_message and parent_message.channel_id:
+        await ChannelService.require_channel_access(db, current_user, parent_message.channel_id)
+    
     result = await db.execute(
         select(MessageTable)
         .where(MessageTable.parent_id == message_id)
-        .options(
-            joinedload(MessageTable.reactions).joinedload(ReactionTable.user),
-            joinedload(MessageTable.file),
-            joinedload(MessageTable.parent_message)
-        )
         .order_by(MessageTable.created_at)
     )
-    messages = result.unique().scalars().all()
+    messages = result.scalars().all()
     
-    # Process each message
-    response_messages = []
-    for message in messages:
-        # Get message author's username
-        user = await db.get(User, message.user_id)
-        username = user.username if user else "System"
-        
-        # Format reactions as {emoji: [usernames]}
-        emoji_data = {}
-        for reaction in message.reactions:
-            if reaction.emoji not in emoji_data:
-                emoji_data[reaction.emoji] = []
-            if reaction.user:
-                emoji_data[reaction.emoji].append(reaction.user.username)
-        
-        # Prepare message data
-        message_data = {
-            "id": message.id,
-            "content": message.content,
-            "channel_id": message.channel_id,
-            "user_id": message.user_id,
-            "created_at": message.created_at,
-            "updated_at": message.updated_at,
-            "username": username,
-            "emojis": emoji_data,
-            "file": None,
-            "parent_id": message.parent_id,
-            "parent_message": None
-        }
-        
-        # Add file info if present
-        if message.file:
-            message_data["file"] = {
-                "id": str(message.file.id),
-                "filename": message.file.filename,
-                "size": message.file.size,
-                "content_type": message.file.content_type
-            }
-        
-        # Add parent message info if present
-        if message.parent_message:
-            parent_user = await db.get(User, message.parent_message.user_id)
-            parent_username = parent_user.username if parent_user else "System"
-            message_data["parent_message"] = {
-                "id": message.parent_message.id,
-                "content": message.parent_message.content,
-                "channel_id": message.parent_message.channel_id,
-                "user_id": message.parent_message.user_id,
-                "username": parent_username,
-                "created_at": message.parent_message.created_at,
-                "updated_at": message.parent_message.updated_at,
-                "emojis": {},  # We don't need reactions for parent messages in threads
-                "file": None,  # We don't need file info for parent messages in threads
-                "parent_id": message.parent_message.parent_id
-            }
-        
-        response_messages.append(Message(**message_data))
+    response_messages = await MessageService.hydrate_messages(
+        db, messages, viewer_id=current_user.id
+    )
+    
+    # Attach the thread parent without reactions or file info
+    if parent_message and response_messages:
+        parent = (await MessageService.hydrate_messages(
+            db, [parent_message], with_reactions=False, with_files=False
+        ))[0]
+        for response_message in response_messages:
+            response_message.parent_message = parent
     
     return response_messages 
 
@@ -404,7 +304,7 @@ async def get_thread_messages(
 async def get_dm_messages(
     target_username: str,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get messages from a DM channel with another user."""
     # Get target user and verify existence
@@ -414,9 +314,7 @@ async def get_dm_messages(
         raise HTTPException(status_code=404, detail=f"User {target_username} not found")
 
     # Get DM channel
-    channel_name = f"DM_{sorted([current_user.username, target_username])[0]}_{sorted([current_user.username, target_username])[1]}"
-    result = await db.execute(select(ChannelTable).where(ChannelTable.name == channel_name))
-    channel = result.scalar_one_or_none()
+    channel = await ChannelService.get_dm_channel(db, current_user.id, target_user.id)
     
     if not channel:
         return []  # Return empty list if no DM channel exists yet
@@ -426,54 +324,12 @@ async def get_dm_messages(
         select(MessageTable)
         .where(MessageTable.channel_id == channel.id)
         .order_by(MessageTable.created_at.desc())
-        .options(
-            joinedload(MessageTable.file),
-            joinedload(MessageTable.reactions).joinedload(ReactionTable.user)
-        )
     )
-    messages = result.unique().scalars().all()
-    
-    # Format messages
-    formatted_messages = []
-    for message in messages:
-        # Get the message sender's username
-        user = await db.get(User, message.user_id)
-        username = user.username if user else "System"
-        
-        # Format file info if present
-        file_info = None
-        if message.file:
-            file_info = FileInfo(
-                id=str(message.file.id),
-                filename=message.file.filename,
-                size=message.file.size,
-                content_type=message.file.content_type
-            )
-        
-        # Format reactions
-        emoji_data = {}
-        for reaction in message.reactions:
-            if reaction.emoji not in emoji_data:
-                emoji_data[reaction.emoji] = []
-            if reaction.user:
-                emoji_data[reaction.emoji].append(reaction.user.username)
-        
-        # Create message object
-        formatted_message = Message(
-            id=message.id,
-            content=message.content,
-            channel_id=message.channel_id,
-            user_id=message.user_id,
-            username=username,
-            created_at=message.created_at,
-            updated_at=message.updated_at,
-            emojis=emoji_data,
-            file=file_info,
-            parent_id=message.parent_id
-        )
-        formatted_messages.append(formatted_message)
+    messages = result.scalars().all()
     
-    return formatted_messages 
+    return await MessageService.hydrate_messages(
+        db, messages, viewer_id=current_user.id
+    )
 
 @router.post("/dm/{target_username}")
 async def send_dm_message(
@@ -491,9 +347,7 @@ async def send_dm_message(
         raise HTTPException(status_code=404, detail=f"User {target_username} not found")
 
     # Get DM channel
-    channel_name = f"DM_{sorted([current_user.username, target_username])[0]}_{sorted([current_user.username, target_username])[1]}"
-    result = await db.execute(select(ChannelTable).where(ChannelTable.name == channel_name))
-    channel = result.scalar_one_or_none()
+    channel = await ChannelService.get_dm_channel(db, current_user.id, target_user.id)
     
     if not channel:
         raise HTTPException(
@@ -502,34 +356,13 @@ async def send_dm_message(
         )
 
     # Now create the message using the existing message creation logic
+    db_file = None
     try:
         # Handle file upload if present
-        db_file = None
         if file:
-            contents = await file.read()
-            if len(contents) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"File too large. Maximum size is {MAX_FILE_SIZE/1024/1024}MB"
-                )
-            
-            unique_filename = f"{uuid.uuid4()}{Path(file.filename).suffix}"
-            file_path = UPLOAD_DIR / unique_filename
-            
-            with open(file_path, "wb") as f:
-                f.write(contents)
+            db_file = await FileService.store_upload(db, file, current_user)
             
-            db_file = FileTable(
-                filename=file.filename,
-                filepath=str(file_path),
-                content_type=file.content_type,
-                size=len(contents),
-                user_id=current_user.id
-            )
-            db.add(db_file)
-            await db.flush()
-            
-            content = f"{content}\nUploaded file: {file.filename} ({len(contents)/1024:.1f} KB) [file:{db_file.id}]"
+            content = f"{content}\nUploaded file: {file.filename} ({db_file.size/1024:.1f} KB) [file:{db_file.id}]"
         
         # Create message
         db_message = MessageTable(
@@ -571,8 +404,10 @@ async def send_dm_message(
         return Message(**response_data)
             
     except Exception as e:
-        if 'file_path' in locals() and file_path.exists():
-            file_path.unlink()
+        if db_file:
+            await FileService.discard_upload(db, db_file.sha256, db_file.filepath)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
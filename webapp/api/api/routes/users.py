@@ -6,7 +6,7 @@ from sqlalchemy import select
 from typing import List
 from pydantic import BaseModel
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models.user import User as UserSchema, UserUpdate
 from ..models.tables.user import User as UserTable
 from ..services.auth import AuthService
@@ -31,14 +31,17 @@ async def update_user_settings(
 ):
     """Update current user's settings."""
     try:
+        # current_user is a read-only snapshot, so update the stored row
+        user = await db.get(UserTable, current_user.id)
+        
         # Update allowed fields
         for field, value in settings.dict(exclude_unset=True).items():
-            setattr(current_user, field, value)
+            setattr(user, field, value)
         
-        db.add(current_user)
         await db.commit()
-        await db.refresh(current_user)
-        return current_user
+        await db.refresh(user)
+        AuthService.invalidate_user_cache(user.id)
+        return user
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -48,14 +51,15 @@ async def update_user_settings(
 @router.get("", response_model=List[UserWithPresence])
 async def get_users(
     current_user: UserSchema = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all users with their online status."""
     try:
         result = await db.execute(select(UserTable))
         users = result.scalars().all()
         
-        # Add presence information
+        # Add presence information with one batched lookup
+        online_ids = await AuthService.get_online_user_ids(user.id for user in users)
         return [
             UserWithPresence(
                 id=user.id,
@@ -64,7 +68,7 @@ async def get_users(
                 is_active=user.is_active,
                 created_at=user.created_at,
                 updated_at=user.updated_at,
-                online_status=AuthService.is_user_active(user.username)
+                online_status=user.id in online_ids
             )
             for user in users
         ]
@@ -78,7 +82,7 @@ async def get_users(
 async def get_user_by_username(
     username: str,
     current_user: UserSchema = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get a specific user by username."""
     user = await AuthService.get_user_by_username(db, username)
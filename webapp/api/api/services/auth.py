@@ -1,32 +1,49 @@
 """Authentication service."""
 
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, Optional, Set
 import jwt
 from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models.user import UserCreate
+from ..models.user import User, UserCreate
 from ..models.tables.user import User as UserTable
 from ..core.config import settings
+from ..utils.cache import TTLCache
+from ..utils.workers import BoundedExecutor
+from .presence import presence_store
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
-# In-memory store for user activity
-user_last_seen: Dict[str, datetime] = {}
+# bcrypt is deliberately slow, so it runs off the event loop
+password_pool = BoundedExecutor(
+    "bcrypt",
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY
+)
+
+# Verified token -> user snapshot, so authenticated requests skip the user query
+token_user_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
 
 class AuthService:
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        """Verify password."""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        """Verify password in the password worker pool."""
+        return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
 
     @staticmethod
-    def get_password_hash(password: str) -> str:
-        """Get password hash."""
-        return pwd_context.hash(password)
+    async def get_password_hash(password: str) -> str:
+        """Get password hash from the password worker pool."""
+        return await password_pool.run(pwd_context.hash, password)
 
     @staticmethod
     def create_access_token(data: dict) -> str:
@@ -38,16 +55,50 @@ class AuthService:
         return encoded_jwt
 
     @staticmethod
-    def verify_token(token: str) -> Optional[str]:
-        """Verify token."""
+    def decode_token(token: str) -> Optional[dict]:
+        """Decode and verify a token, returning its claims."""
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username: str = payload.get("sub")
-            if username is None:
-                return None
-            return username
         except InvalidTokenError:
             return None
+        if payload.get("sub") is None:
+            return None
+        return payload
+
+    @staticmethod
+    def verify_token(token: str) -> Optional[str]:
+        """Verify token."""
+        payload = AuthService.decode_token(token)
+        return payload["sub"] if payload else None
+
+    @staticmethod
+    async def get_user_by_token(db: AsyncSession, token: str) -> Optional[User]:
+        """Resolve a token to a read-only snapshot of its user, using the token cache when possible.
+
+        The snapshot is a User schema, never an ORM row, so it can't be
+        added or merged into a session by mistake; handlers that change the
+        user load the row by ID. Entries never outlive the token's exp claim.
+        """
+        snapshot = token_user_cache.get(token)
+        if snapshot is not None:
+            # Validated when it was cached
+            return User.model_construct(**snapshot)
+
+        payload = AuthService.decode_token(token)
+        if payload is None:
+            return None
+        user = await AuthService.get_user_by_username(db, payload["sub"])
+        if user is None:
+            return None
+
+        user = User.model_validate(user)
+        token_user_cache.set(token, user.model_dump(), expires_at=payload.get("exp"))
+        return user
+
+    @staticmethod
+    def invalidate_user_cache(user_id: int) -> None:
+        """Drop cached token lookups for a user after their record changes."""
+        token_user_cache.invalidate_where(lambda snapshot: snapshot["id"] == user_id)
 
     @staticmethod
     async def get_user_by_email(db: AsyncSession, email: str) -> Optional[UserTable]:
@@ -67,7 +118,7 @@ class AuthService:
         user = await AuthService.get_user_by_username(db, username)
         if not user:
             return None
-        if not AuthService.verify_password(password, user.hashed_password):
+        if not await AuthService.verify_password(password, user.hashed_password):
             return None
         return user
 
@@ -77,7 +128,7 @@ class AuthService:
         db_user = UserTable(
             email=user.email,
             username=user.username,
-            hashed_password=AuthService.get_password_hash(user.password)
+            hashed_password=await AuthService.get_password_hash(user.password)
         )
         db.add(db_user)
         await db.commit()
@@ -85,13 +136,11 @@ class AuthService:
         return db_user 
 
     @staticmethod
-    def update_user_activity(username: str) -> None:
-        """Update the last seen timestamp for a user."""
-        user_last_seen[username] = datetime.utcnow()
+    async def update_user_activity(user_id: int) -> None:
+        """Record a presence heartbeat for a user."""
+        await presence_store.heartbeat(user_id)
     
     @staticmethod
-    def is_user_active(username: str) -> bool:
-        """Check if a user has been active in the last 5 seconds."""
-        if username not in user_last_seen:
-            return False
-        return datetime.utcnow() - user_last_seen[username] <= timedelta(seconds=5) 
\ No newline at end of file
+    async def get_online_user_ids(user_ids: Iterable[int]) -> Set[int]:
+        """Get which of the given users have been active recently."""
+        return await presence_store.online_among(user_ids) 
\ No newline at end of file
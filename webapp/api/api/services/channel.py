@@ -1,15 +1,51 @@
 """Channel service."""
 
+import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import FrozenSet, List, Optional, Tuple
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
 from ..models.tables.channel import Channel, channel_members
+from ..models.tables.dm_channel import DMChannel
 from ..models.tables.user import User
-from ..database import get_db
+from ..database import AsyncSessionLocal, is_replica_session
+from ..core.config import settings
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# User ID -> (membership version, IDs of the channels they belong to), so
+# ACL checks skip the DB
+channel_membership_cache: TTLCache[Tuple[int, FrozenSet[int]]] = TTLCache(
+    maxsize=settings.MEMBERSHIP_CACHE_MAX_SIZE,
+    ttl=settings.MEMBERSHIP_CACHE_TTL_SECONDS
+)
+
+# With the redis backend, every membership change bumps a per-user version
+# key, so a worker's cached memberships go stale as soon as another worker
+# changes them
+membership_version_client: Optional[aioredis.Redis] = None
+if settings.MEMBERSHIP_CACHE_BACKEND == "redis":
+    membership_version_client = aioredis.Redis(
+        host=settings.REDIS_HOST,
+        port=int(settings.REDIS_PORT),
+        db=0,
+        decode_responses=True
+    )
+
+def _membership_version_key(user_id: int) -> str:
+    return f"membership_version:{user_id}"
+
+# Channel ID -> is_private. Privacy is fixed at creation, so entries only age out
+channel_privacy_cache: TTLCache[bool] = TTLCache(
+    maxsize=settings.MEMBERSHIP_CACHE_MAX_SIZE,
+    ttl=24 * 60 * 60
+)
 
 class ChannelService:
     """Service for managing channels."""
@@ -60,6 +96,10 @@ class ChannelService:
                 )
             
             await db.commit()
+            if members:
+                await ChannelService.invalidate_membership_cache(*(member.id for member in members))
+            elif created_by_user and is_private:
+                await ChannelService.invalidate_membership_cache(created_by_user.id)
             await db.refresh(channel)
             return channel
             
@@ -90,14 +130,60 @@ class ChannelService:
 
     @staticmethod
     async def get_channels(db: AsyncSession) -> List[Channel]:
-        """Get all public channels, excluding DM channels."""
+        """Get all public channels. DM channels are always private."""
         result = await db.execute(
-            select(Channel)
-            .filter(Channel.is_private == False)
-            .filter(~Channel.name.startswith('DM_'))  # Exclude DM channels
+            select(Channel).filter(Channel.is_private == False)
         )
         return list(result.scalars().all())
 
+    @staticmethod
+    async def get_dm_channel(db: AsyncSession, user_id: int, other_user_id: int) -> Optional[Channel]:
+        """Get the DM channel between two users, if one exists."""
+        user_low_id, user_high_id = DMChannel.key(user_id, other_user_id)
+        result = await db.execute(
+            select(Channel)
+            .join(DMChannel, DMChannel.channel_id == Channel.id)
+            .filter(DMChannel.user_low_id == user_low_id, DMChannel.user_high_id == user_high_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_or_create_dm_channel(db: AsyncSession, user: User, other_user: User) -> Channel:
+        """Get the DM channel between two users, creating it on first use."""
+        channel = await ChannelService.get_dm_channel(db, user.id, other_user.id)
+        if channel:
+            return channel
+
+        user_low_id, user_high_id = DMChannel.key(user.id, other_user.id)
+        first, second = sorted([user.username, other_user.username])
+        try:
+            channel = Channel(
+                name=f"DM_{first}_{second}",
+                description=f"Direct messages between {user.username} and {other_user.username}",
+                is_private=True
+            )
+            db.add(channel)
+            await db.flush()  # Flush to get the channel ID
+            await db.execute(
+                channel_members.insert(),
+                [{"channel_id": channel.id, "user_id": member_id} for member_id in {user.id, other_user.id}]
+            )
+            db.add(DMChannel(user_low_id=user_low_id, user_high_id=user_high_id, channel_id=channel.id))
+            await db.commit()
+            await ChannelService.invalidate_membership_cache(user.id, other_user.id)
+            await db.refresh(channel)
+            return channel
+        except IntegrityError:
+            # Another request created the same DM first
+            await db.rollback()
+            channel = await ChannelService.get_dm_channel(db, user.id, other_user.id)
+            if channel:
+                return channel
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Channel with this name already exists"
+            )
+
     @staticmethod
     async def get_user_channels(db: AsyncSession, user: User) -> List[Channel]:
         """Get channels where user is a member."""
@@ -108,6 +194,102 @@ class ChannelService:
         )
         return list(result.scalars().all())
 
+    @staticmethod
+    async def get_member_channel_ids(db: AsyncSession, user_id: int) -> FrozenSet[int]:
+        """Get the IDs of the channels a user belongs to, using the membership cache.
+
+        Cached entries are only used while the user's membership version is
+        unchanged. Misses are always loaded from the primary: a lagging
+        replica could otherwise cache a membership the user no longer (or
+        not yet) has.
+        """
+        version = await ChannelService.get_membership_version(user_id)
+        cached = channel_membership_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        channel_ids = await ChannelService.load_member_channel_ids(db, user_id)
+        if version is not None:
+            channel_membership_cache.set(user_id, (version, channel_ids))
+        return channel_ids
+
+    @staticmethod
+    async def load_member_channel_ids(db: AsyncSession, user_id: int) -> FrozenSet[int]:
+        """Query the IDs of the channels a user belongs to from the primary."""
+        if is_replica_session(db):
+            async with AsyncSessionLocal() as primary_db:
+                return await ChannelService.load_member_channel_ids(primary_db, user_id)
+        result = await db.execute(
+            select(channel_members.c.channel_id).where(channel_members.c.user_id == user_id)
+        )
+        return frozenset(result.scalars().all())
+
+    @staticmethod
+    async def get_membership_version(user_id: int) -> Optional[int]:
+        """Get a user's shared membership version, or None if it can't be read."""
+        if membership_version_client is None:
+            return 0
+        try:
+            return int(await membership_version_client.get(_membership_version_key(user_id)) or 0)
+        except RedisError as e:
+            # Can't tell whether the cache is current, so skip it
+            logger.error(f"Redis error reading membership version for user {user_id}: {e}")
+            return None
+
+    @staticmethod
+    async def is_member(db: AsyncSession, user_id: int, channel_id: int) -> bool:
+        """Check channel membership, using the membership cache."""
+        return channel_id in await ChannelService.get_member_channel_ids(db, user_id)
+
+    @staticmethod
+    async def invalidate_membership_cache(*user_ids: int) -> None:
+        """Drop cached memberships for users after they join or leave a channel, on every worker."""
+        for user_id in user_ids:
+            channel_membership_cache.pop(user_id)
+        if membership_version_client is None or not user_ids:
+            return
+        try:
+            async with membership_version_client.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.incr(_membership_version_key(user_id))
+                    # Outlives every entry cached under the previous version
+                    pipe.expire(_membership_version_key(user_id), settings.MEMBERSHIP_CACHE_TTL_SECONDS * 2)
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error invalidating memberships for users {user_ids}: {e}")
+
+    @staticmethod
+    async def require_channel_access(db: AsyncSession, user: User, channel_id: int) -> None:
+        """Check that a user may read and post in a channel.
+
+        Members always may; anyone may use a public channel. Both answers are
+        cached, so repeat checks don't touch the database.
+        """
+        if await ChannelService.is_member(db, user.id, channel_id):
+            return
+
+        is_private = channel_privacy_cache.get(channel_id)
+        if is_private is None:
+            result = await db.execute(select(Channel.is_private).filter(Channel.id == channel_id))
+            is_private = result.scalar_one_or_none()
+            if is_private is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Channel not found"
+                )
+            is_private = bool(is_private)
+            channel_privacy_cache.set(channel_id, is_private)
+
+        if is_private:
+            # Re-check on the primary before refusing, in case the cached
+            # membership predates a join
+            channel_membership_cache.pop(user.id)
+            if await ChannelService.is_member(db, user.id, channel_id):
+                return
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not a member of this channel"
+            )
+
     @staticmethod
     async def join_channel(db: AsyncSession, channel: Channel, user: User) -> Channel:
         """Add a user to a channel."""
@@ -119,26 +301,30 @@ class ChannelService:
             )
 
         # Check if user is already a member
-        result = await db.execute(
-            select(channel_members).where(
-                (channel_members.c.channel_id == channel.id) &
-                (channel_members.c.user_id == user.id)
-            )
-        )
-        if result.first() is not None:
+        if await ChannelService.is_member(db, user.id, channel.id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User is already a member of this channel"
             )
         
         # Add user to channel
-        await db.execute(
-            channel_members.insert().values(
-                channel_id=channel.id,
-                user_id=user.id
+        try:
+            await db.execute(
+                channel_members.insert().values(
+                    channel_id=channel.id,
+                    user_id=user.id
+                )
             )
-        )
-        await db.commit()
+            await db.commit()
+        except IntegrityError:
+            # Joined from another worker since the membership was cached
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User is already a member of this channel"
+            )
+        finally:
+            await ChannelService.invalidate_membership_cache(user.id)
         await db.refresh(channel)
         return channel
 
@@ -146,13 +332,7 @@ class ChannelService:
     async def leave_channel(db: AsyncSession, channel: Channel, user: User) -> Channel:
         """Remove a user from a channel."""
         # Check if user is a member
-        result = await db.execute(
-            select(channel_members).where(
-                (channel_members.c.channel_id == channel.id) &
-                (channel_members.c.user_id == user.id)
-            )
-        )
-        if result.first() is None:
+        if not await ChannelService.is_member(db, user.id, channel.id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User is not a member of this channel"
@@ -166,6 +346,7 @@ class ChannelService:
             )
         )
         await db.commit()
+        await ChannelService.invalidate_membership_cache(user.id)
         await db.refresh(channel)
         return channel
 
@@ -175,38 +356,35 @@ class ChannelService:
         # Check if channel is private
         if channel.is_private:
             # Check if current user is a member
-            result = await db.execute(
-                select(channel_members).where(
-                    (channel_members.c.channel_id == channel.id) &
-                    (channel_members.c.user_id == current_user.id)
-                )
-            )
-            if result.first() is None:
+            if not await ChannelService.is_member(db, current_user.id, channel.id):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Only channel members can add users to private channels"
                 )
 
         # Check if user is already a member
-        result = await db.execute(
-            select(channel_members).where(
-                (channel_members.c.channel_id == channel.id) &
-                (channel_members.c.user_id == user_to_add.id)
-            )
-        )
-        if result.first() is not None:
+        if await ChannelService.is_member(db, user_to_add.id, channel.id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User is already a member of this channel"
             )
         
         # Add user to channel
-        await db.execute(
-            channel_members.insert().values(
-                channel_id=channel.id,
-                user_id=user_to_add.id
+        try:
+            await db.execute(
+                channel_members.insert().values(
+                    channel_id=channel.id,
+                    user_id=user_to_add.id
+                )
             )
-        )
-        await db.commit()
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User is already a member of this channel"
+            )
+        finally:
+            await ChannelService.invalidate_membership_cache(user_to_add.id)
         await db.refresh(channel)
-        return channel 
\ No newline at end of file
+        return channel
\ No newline at end of file
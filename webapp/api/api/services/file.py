@@ -0,0 +1,107 @@
+"""File service."""
+
+import uuid
+from pathlib import Path
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, UploadFile, status
+
+from ..core.config import settings
+from ..models.tables.file import File as FileTable
+from ..models.tables.user import User
+from ..utils.files import FileTooLargeError, save_upload, move_to_blob
+
+# Configure upload settings
+UPLOAD_DIR = Path(settings.UPLOAD_DIR)
+MAX_FILE_SIZE = settings.MAX_UPLOAD_SIZE
+
+# Create uploads directory if it doesn't exist
+UPLOAD_DIR.mkdir(exist_ok=True)
+(UPLOAD_DIR / "tmp").mkdir(exist_ok=True)
+
+class FileService:
+    """Service for content-addressed file storage.
+
+    Uploads are stored once per SHA-256 under UPLOAD_DIR/blobs. Every files
+    row holding the same hash is a reference to that blob, and the blob is
+    only unlinked when the last reference is deleted.
+    """
+
+    @staticmethod
+    async def lock_blob(db: AsyncSession, sha256: str) -> None:
+        """Serialize blob writes and deletes for one hash until the transaction ends."""
+        lock_key = int.from_bytes(bytes.fromhex(sha256[:16]), "big", signed=True)
+        await db.execute(select(func.pg_advisory_xact_lock(lock_key)))
+
+    @staticmethod
+    async def count_references(db: AsyncSession, sha256: str) -> int:
+        """Count file records pointing at a blob."""
+        result = await db.execute(
+            select(func.count(FileTable.id)).where(FileTable.sha256 == sha256)
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def store_upload(db: AsyncSession, file: UploadFile, user: User) -> FileTable:
+        """Stream an upload into the blob store and add its file record to the session."""
+        temp_path = UPLOAD_DIR / "tmp" / str(uuid.uuid4())
+        try:
+            stored = await save_upload(file, temp_path, MAX_FILE_SIZE)
+        except FileTooLargeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+
+        try:
+            await FileService.lock_blob(db, stored.sha256)
+            filepath = await move_to_blob(stored, UPLOAD_DIR)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+        # Create file record without committing
+        db_file = FileTable(
+            filename=file.filename,
+            filepath=str(filepath),
+            sha256=stored.sha256,
+            content_type=file.content_type,
+            size=stored.size,
+            user_id=user.id
+        )
+        db.add(db_file)
+        try:
+            await db.flush()  # Get file ID without committing
+        except Exception:
+            await FileService.discard_upload(db, stored.sha256, str(filepath))
+            raise
+        return db_file
+
+    @staticmethod
+    async def delete_file(db: AsyncSession, file: FileTable) -> None:
+        """Delete a file record, unlinking its blob if nothing else references it."""
+        sha256, filepath = file.sha256, file.filepath
+        await db.delete(file)
+        await db.commit()
+        if sha256 is None:
+            # Files stored before content addressing own their path
+            Path(filepath).unlink(missing_ok=True)
+            return
+        await FileService.unlink_if_unreferenced(db, sha256, filepath)
+
+    @staticmethod
+    async def discard_upload(db: AsyncSession, sha256: str, filepath: str) -> None:
+        """Roll back a failed upload, unlinking its blob unless another file references it."""
+        await db.rollback()
+        await FileService.unlink_if_unreferenced(db, sha256, filepath)
+
+    @staticmethod
+    async def unlink_if_unreferenced(db: AsyncSession, sha256: str, filepath: str) -> None:
+        """Unlink a blob once no committed file record references it.
+
+        Callers commit their record changes first, so a failed commit never
+        leaves a record pointing at a missing blob.
+        """
+        await FileService.lock_blob(db, sha256)
+        if await FileService.count_references(db, sha256) == 0:
+            Path(filepath).unlink(missing_ok=True)
+        await db.commit()
@@ -0,0 +1,138 @@
+"""Message service."""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.tables.user import User
+from ..models.tables.message import Message as MessageTable
+from ..models.tables.reaction import Reaction as ReactionTable
+from ..models.tables.file import File as FileTable
+from ..models.message import Message, FileInfo
+
+# Number of reactor usernames returned per emoji in message lists
+REACTION_SAMPLE_SIZE = 10
+
+class MessageService:
+    """Service for turning message rows into API responses."""
+
+    @staticmethod
+    async def get_usernames(db: AsyncSession, user_ids: Sequence[int]) -> Dict[int, str]:
+        """Get usernames for a set of user IDs in one query."""
+        if not user_ids:
+            return {}
+        result = await db.execute(
+            select(User.id, User.username).where(User.id.in_(set(user_ids)))
+        )
+        return {user_id: username for user_id, username in result.all()}
+
+    @staticmethod
+    async def get_reactions(
+        db: AsyncSession,
+        message_ids: Sequence[int],
+        viewer_id: Optional[int] = None
+    ) -> Tuple[Dict[int, Dict[str, List[str]]], Dict[int, Dict[str, int]]]:
+        """Get aggregated reactions for a set of messages in one query.
+
+        Returns ({message_id: {emoji: [usernames]}}, {message_id: {emoji: count}}).
+        Username lists are capped at REACTION_SAMPLE_SIZE; the viewer is always
+        listed first so clients can tell whether they already reacted.
+        """
+        if not message_ids:
+            return {}, {}
+        viewer_first = (ReactionTable.user_id == literal(viewer_id)).desc()
+        usernames = array_agg(
+            aggregate_order_by(User.username, viewer_first, ReactionTable.created_at)
+        )
+        result = await db.execute(
+            select(
+                ReactionTable.message_id,
+                ReactionTable.emoji,
+                func.count(ReactionTable.id),
+                usernames[1:REACTION_SAMPLE_SIZE]
+            )
+            .join(User, ReactionTable.user_id == User.id)
+            .where(ReactionTable.message_id.in_(message_ids))
+            .group_by(ReactionTable.message_id, ReactionTable.emoji)
+            .order_by(func.min(ReactionTable.created_at))
+        )
+        reactions: Dict[int, Dict[str, List[str]]] = {}
+        counts: Dict[int, Dict[str, int]] = {}
+        for message_id, emoji, count, sample in result.all():
+            reactions.setdefault(message_id, {})[emoji] = list(sample or [])
+            counts.setdefault(message_id, {})[emoji] = count
+        return reactions, counts
+
+    @staticmethod
+    async def get_files(db: AsyncSession, message_ids: Sequence[int]) -> Dict[int, FileInfo]:
+        """Get file attachments keyed by message ID in one query."""
+        if not message_ids:
+            return {}
+        result = await db.execute(
+            select(FileTable).where(FileTable.message_id.in_(message_ids))
+        )
+        return {
+            file.message_id: FileInfo(
+                id=str(file.id),
+                filename=file.filename,
+                size=file.size,
+                content_type=file.content_type
+            )
+            for file in result.scalars().all()
+        }
+
+    @staticmethod
+    async def adjust_replies_count(db: AsyncSession, parent_id: int, delta: int = 1) -> None:
+        """Adjust a thread parent's reply counter in SQL, without loading it."""
+        await db.execute(
+            update(MessageTable)
+            .where(MessageTable.id == parent_id)
+            .values(replies_count=func.greatest(MessageTable.replies_count + delta, 0))
+        )
+
+    @staticmethod
+    async def hydrate_messages(
+        db: AsyncSession,
+        messages: Sequence[MessageTable],
+        with_reactions: bool = True,
+        with_files: bool = True,
+        viewer_id: Optional[int] = None
+    ) -> List[Message]:
+        """Build response models for a page of messages.
+
+        Authors, reactions and files are each loaded with a single batched
+        query, so the cost does not grow with the page size. Reactions are
+        aggregated per emoji in SQL. Reply counts come from the denormalized
+        replies_count column.
+        """
+        if not messages:
+            return []
+
+        message_ids = [message.id for message in messages]
+        usernames = await MessageService.get_usernames(
+            db, [message.user_id for message in messages]
+        )
+        reactions, reaction_counts = (
+            await MessageService.get_reactions(db, message_ids, viewer_id)
+            if with_reactions else ({}, {})
+        )
+        files = await MessageService.get_files(db, message_ids) if with_files else {}
+
+        return [
+            Message(
+                id=message.id,
+                content=message.content,
+                channel_id=message.channel_id,
+                user_id=message.user_id,
+                created_at=message.created_at,
+                updated_at=message.updated_at,
+                username=usernames.get(message.user_id, "System"),
+                emojis=reactions.get(message.id, {}),
+                emoji_counts=reaction_counts.get(message.id, {}),
+                file=files.get(message.id),
+                parent_id=message.parent_id,
+                replies_count=message.replies_count or 0
+            )
+            for message in messages
+        ]
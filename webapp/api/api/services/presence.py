@@ -0,0 +1,115 @@
+"""Presence service."""
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Set
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..core.config import settings
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class PresenceStore(ABC):
+    """Tracks when users were last seen and who is currently online."""
+
+    def __init__(self, timeout_seconds: float = settings.PRESENCE_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+
+    @abstractmethod
+    async def heartbeat(self, user_id: int) -> None:
+        """Record that a user is active now."""
+
+    @abstractmethod
+    async def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        """Get which of the given users have been seen within the timeout."""
+
+class InMemoryPresenceStore(PresenceStore):
+    """Per-process presence store, for tests and single-worker setups."""
+
+    def __init__(self, timeout_seconds: float = settings.PRESENCE_TIMEOUT_SECONDS):
+        super().__init__(timeout_seconds)
+        self.last_seen: Dict[int, float] = {}
+
+    async def heartbeat(self, user_id: int) -> None:
+        self.last_seen[user_id] = time.time()
+
+    async def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        cutoff = time.time() - self.timeout_seconds
+        return {user_id for user_id in user_ids if self.last_seen.get(user_id, 0) >= cutoff}
+
+class RedisPresenceStore(PresenceStore):
+    """Presence shared by all workers, kept in a Redis sorted set.
+
+    Members are user IDs scored by last-seen time, so a heartbeat is one
+    ZADD and an online check is one ZMSCORE for the whole batch. Each
+    process sends at most one heartbeat per user per throttle window.
+    """
+
+    KEY = "presence:last_seen"
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        timeout_seconds: float = settings.PRESENCE_TIMEOUT_SECONDS,
+        heartbeat_interval: float = 1.0,
+        prune_every: int = 1000,
+        throttle_max_size: int = 10000
+    ):
+        super().__init__(timeout_seconds)
+        self.client = client
+        self.heartbeat_interval = heartbeat_interval
+        self.prune_every = prune_every
+        # Users who sent a heartbeat within the interval; entries expire with
+        # it, and evicting one early only costs an extra ZADD
+        self._recently_sent: TTLCache[bool] = TTLCache(maxsize=throttle_max_size, ttl=heartbeat_interval)
+        self._heartbeats = 0
+
+    async def heartbeat(self, user_id: int) -> None:
+        if self._recently_sent.get(user_id):
+            return
+        now = time.time()
+        self._recently_sent.set(user_id, True)
+        self._heartbeats += 1
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.zadd(self.KEY, {str(user_id): now})
+                # Occasionally drop users who have long gone offline
+                if self._heartbeats % self.prune_every == 0:
+                    pipe.zremrangebyscore(self.KEY, "-inf", now - self.timeout_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error recording presence for user {user_id}: {e}")
+
+    async def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        try:
+            scores = await self.client.zmscore(self.KEY, [str(user_id) for user_id in user_ids])
+        except RedisError as e:
+            logger.error(f"Redis error reading presence: {e}")
+            return set()
+        cutoff = time.time() - self.timeout_seconds
+        return {
+            user_id
+            for user_id, score in zip(user_ids, scores)
+            if score is not None and score >= cutoff
+        }
+
+def create_presence_store() -> PresenceStore:
+    """Create the presence store selected by PRESENCE_BACKEND."""
+    if settings.PRESENCE_BACKEND == "memory":
+        return InMemoryPresenceStore()
+    client = aioredis.Redis(
+        host=settings.REDIS_HOST,
+        port=int(settings.REDIS_PORT),
+        db=0,
+        decode_responses=True
+    )
+    return RedisPresenceStore(client)
+
+presence_store = create_presence_store()
@@ -0,0 +1,60 @@
+"""In-process caching utilities."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class TTLCache(Generic[V]):
+    """Bounded LRU cache whose entries expire after a TTL.
+
+    Each entry may also carry its own earlier expiry (e.g. a token's exp).
+    Times are wall-clock seconds so they can be compared with JWT claims.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Get a live entry, dropping it if it has expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, expires_at: Optional[float] = None) -> None:
+        """Store an entry until the TTL or expires_at, whichever comes first."""
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        self._entries[key] = (deadline, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        """Remove an entry and return its value, if present."""
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def invalidate_where(self, predicate: Callable[[V], Any]) -> int:
+        """Remove all entries whose value matches predicate. Returns the count removed."""
+        keys = [key for key, (_, value) in self._entries.items() if predicate(value)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
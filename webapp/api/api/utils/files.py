@@ -0,0 +1,124 @@
+"""File storage utilities."""
+
+import hashlib
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+# Read uploads in 64KB chunks so at most one chunk is held in memory
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the allowed size."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File too large. Maximum size is {max_size/1024/1024}MB")
+
+class StoredFile(NamedTuple):
+    """Result of streaming an upload to disk."""
+    path: Path
+    size: int
+    sha256: str
+
+async def save_upload(
+    upload: UploadFile,
+    destination: Path,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredFile:
+    """Stream an upload to disk, enforcing max_size and hashing as it goes.
+
+    The partially written file is removed if the upload is too large or
+    anything else goes wrong.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(destination, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(max_size)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return StoredFile(path=destination, size=size, sha256=digest.hexdigest())
+
+def blob_path(root: Path, sha256: str) -> Path:
+    """Get the content-addressed location of a blob, fanned out by hash prefix."""
+    return root / "blobs" / sha256[:2] / sha256
+
+async def move_to_blob(stored: StoredFile, root: Path) -> Path:
+    """Move a stored upload to its content-addressed blob path.
+
+    The move always replaces the blob, so an upload also restores a blob
+    that was removed concurrently.
+    """
+    destination = blob_path(root, stored.sha256)
+    await aiofiles.os.makedirs(destination.parent, exist_ok=True)
+    await aiofiles.os.replace(stored.path, destination)
+    return destination
+
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    """Build a Content-Disposition header the way FileResponse does.
+
+    Names that aren't safe to quote as-is (non-ASCII, quotes, CR/LF, ...)
+    are sent percent-encoded as an RFC 6266 filename* parameter.
+    """
+    encoded = quote(filename)
+    if encoded != filename:
+        return f"{disposition}; filename*=utf-8''{encoded}"
+    return f'{disposition}; filename="{filename}"'
+
+def parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single byte range into an inclusive (start, end) pair.
+
+    Returns None when the header is not a single byte range we serve, in
+    which case the whole file should be sent. Raises ValueError when the
+    range cannot be satisfied.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start_str, sep, end_str = ranges.strip().partition("-")
+    if not sep or not (start_str or end_str):
+        return None
+    if not all(part.isdigit() for part in (start_str, end_str) if part):
+        return None
+    if start_str:
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    else:
+        # Suffix range: the last N bytes
+        suffix_length = int(end_str)
+        if suffix_length == 0:
+            raise ValueError("Range not satisfiable")
+        start = max(size - suffix_length, 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+async def iter_file_range(
+    path: Path,
+    start: int,
+    end: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Stream the inclusive byte range [start, end] of a file."""
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
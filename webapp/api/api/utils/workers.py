@@ -0,0 +1,71 @@
+"""Worker pool utilities."""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+class BoundedExecutor:
+    """Thread pool for blocking work with a cap on concurrent submissions.
+
+    At most max_concurrency calls are queued or running at once; further
+    callers wait on a semaphore instead of piling up in the pool queue.
+    Basic counters are kept for monitoring.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_concurrency: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run func(*args) in the pool without blocking the event loop."""
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - queued_at
+        self.in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get a snapshot of the pool counters."""
+        finished = self.completed + self.failed
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": 1000 * self.total_wait_seconds / finished if finished else 0.0,
+            "avg_run_ms": 1000 * self.total_run_seconds / finished if finished else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the pool, waiting for running calls to finish."""
+        self._executor.shutdown(wait=True)
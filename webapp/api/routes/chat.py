@@ -6,6 +6,10 @@ from ..services.channel import ChannelService
 from ..models.message import MessageCreate, Message
 from ..models.user import User
 from ..utils.redis_manager import RedisManager
+from ..utils import serialization
+from api.core.config import settings
+from api.database import AsyncSessionLocal
+from api.services.channel import ChannelService as ChannelAccess
 from typing import List, Optional
 import logging
 from fastapi.security import OAuth2PasswordBearer
@@ -73,12 +77,36 @@ async def clear_messages(current_user: User = Depends(get_current_user)):
     message_service.clear_messages()
     return {"message": "Messages cleared"}
 
+async def readable_channel_ids(user: User, channel_ids: List[str]) -> List[str]:
+    """Filter channel_ids down to the channels a user may read."""
+    allowed = []
+    async with AsyncSessionLocal() as db:
+        for channel_id in channel_ids:
+            try:
+                await ChannelAccess.require_channel_access(db, user, int(channel_id))
+            except (HTTPException, ValueError):
+                continue
+            allowed.append(channel_id)
+    return allowed
+
 @router.websocket("/ws/{username}")
 async def websocket_endpoint(
     websocket: WebSocket,
     username: str,
-    token: str
+    token: str,
+    batch: bool = False,
+    batch_ms: Optional[int] = None,
+    encoding: str = "json"
 ):
+    """Chat WebSocket.
+
+    With ?batch=true, outbound events are coalesced into one array frame
+    per flush window of batch_ms (default WS_BATCH_FLUSH_MS).
+
+    With ?encoding=msgpack, outbound events are binary MessagePack frames
+    using the short keys in serialization.SHORT_KEYS. permessage-deflate
+    is negotiated by the server whenever the client offers it.
+    """
     auth_service = AuthService()
     message_service = MessageService()
     channel_service = ChannelService()
@@ -98,8 +126,22 @@ async def websocket_endpoint(
             await websocket.close(code=4003, reason="Username mismatch")
             return
 
+        if encoding not in ("json", "msgpack") or (encoding == "msgpack" and serialization.msgpack is None):
+            await websocket.close(code=1003, reason=f"Unsupported encoding: {encoding}")
+            return
+
         # Connect to Redis manager
-        await redis_manager.connect(websocket, username)
+        flush_interval = None
+        if batch:
+            flush_ms = min(max(batch_ms or settings.WS_BATCH_FLUSH_MS, 1), settings.WS_BATCH_MAX_FLUSH_MS)
+            flush_interval = flush_ms / 1000
+        # Live delivery and resume both follow the user's channel memberships
+        async with AsyncSessionLocal() as db:
+            member_channel_ids = await ChannelAccess.get_member_channel_ids(db, user.id)
+        await redis_manager.connect(
+            websocket, username, encoding, flush_interval,
+            channel_ids=[str(channel_id) for channel_id in member_channel_ids]
+        )
         logger.info(f"User {username} connected successfully")
 
         try:
@@ -108,10 +150,35 @@ async def websocket_endpoint(
                 data = await websocket.receive_json()
                 logger.info(f"WebSocket received message: {data}")
                 
+                # Replay what a reconnecting client missed, per channel:
+                # {"type": "resume", "last_ids": {channel_id: stream_id}}
+                # or {"type": "resume", "channel_id": ..., "last_id": ...}
+                if isinstance(data, dict) and data.get("type") == "resume":
+                    last_ids = {str(k): v for k, v in (data.get("last_ids") or {}).items()}
+                    if data.get("channel_id") and data.get("last_id"):
+                        last_ids[str(data["channel_id"])] = data["last_id"]
+                    try:
+                        # Public channels the user reads without joining are
+                        # subscribed here, once access is checked
+                        unsubscribed = [
+                            channel_id for channel_id in last_ids
+                            if username not in redis_manager.local_channels.get(channel_id, ())
+                        ]
+                        await redis_manager.subscribe_to_channels(
+                            username, await readable_channel_ids(user, unsubscribed)
+                        )
+                        await redis_manager.resume(username, last_ids)
+                    except Exception as e:
+                        logger.error(f"Error resuming channels for {username}: {str(e)}")
+                        await redis_manager.send_to_user(username, {
+                            "error": f"Cannot resume: {str(e)}"
+                        })
+                    continue
+                
                 # Validate message data
                 if not isinstance(data, dict) or 'content' not in data or ('channelId' not in data and 'channel_id' not in data):
                     logger.error(f"Invalid message format: {data}")
-                    await websocket.send_json({
+                    await redis_manager.send_to_user(username, {
                         "error": "Invalid message format. Expected {content, channelId or channel_id}"
                     })
                     continue
@@ -133,7 +200,7 @@ async def websocket_endpoint(
                     
                 except Exception as e:
                     logger.error(f"Error processing message: {str(e)}")
-                    await websocket.send_json({
+                    await redis_manager.send_to_user(username, {
                         "error": f"Error processing message: {str(e)}"
                     })
                     
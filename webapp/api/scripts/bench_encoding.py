@@ -0,0 +1,81 @@
+"""Compare WebSocket frame size and encode time for JSON and MessagePack.
+
+Encodes a burst of chat message frames (like a history replay on
+reconnect) in each format, and reports the raw size, the size after
+permessage-deflate style compression, and the encode time per frame.
+
+    python scripts/bench_encoding.py --frames 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.utils.serialization import dumps, pack_frame, with_field
+
+WORDS = "the quick brown fox jumps over a lazy dog while bots post updates every few seconds".split()
+
+def make_messages(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40))),
+            "channel_id": rng.randint(1, 20),
+            "user_id": rng.randint(1, 500),
+            "username": f"user{rng.randint(1, 500)}",
+            "created_at": (start + timedelta(seconds=i)).isoformat(),
+            "updated_at": None,
+            "parent_id": None,
+            "replies_count": rng.randint(0, 3),
+            "emojis": {},
+            "emoji_counts": {},
+            "file": None,
+        }
+        for i in range(count)
+    ]
+
+def deflated_size(frames: list) -> int:
+    """Total size with one shared deflate context, as permessage-deflate does."""
+    compressor = zlib.compressobj(wbits=-15)
+    total = 0
+    for frame in frames:
+        data = frame.encode() if isinstance(frame, str) else frame
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+def timed(encode, items) -> tuple:
+    started = time.perf_counter()
+    frames = [encode(item) for item in items]
+    return frames, (time.perf_counter() - started) / len(items) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    messages = make_messages(args.frames, args.seed)
+    json_frames, json_us = timed(
+        lambda message: with_field(dumps(message), "stream_id", f"{message['id']}-0"), messages
+    )
+    # Server-side MessagePack frames are transcoded from the published JSON text
+    msgpack_frames, msgpack_us = timed(pack_frame, json_frames)
+
+    print(f"{'format':<12}{'bytes':>12}{'deflated':>12}{'us/frame':>12}")
+    for name, frames, us in (
+        ("json", json_frames, json_us),
+        ("msgpack", msgpack_frames, json_us + msgpack_us),
+    ):
+        size = sum(len(frame.encode() if isinstance(frame, str) else frame) for frame in frames)
+        print(f"{name:<12}{size:>12}{deflated_size(frames):>12}{us:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Record EXPLAIN ANALYZE for the hot message queries before and after the
+message access indexes.
+
+Seeds users, channels, memberships, messages, replies, reactions and files
+into a scratch schema, runs the queries the API issues, adds the indexes
+from the e5a7c93d1f28 migration, and runs them again. Prints a summary and
+writes the full plans to --output.
+
+    python scripts/bench_indexes.py --messages 1000000 --output index_plans.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+
+from sqlalchemy import create_engine, text
+
+# Same indexes as alembic/versions/..._e5a7c93d1f28_add_message_access_indexes.py
+INDEXES = [
+    ('ix_messages_channel_id_created_at_id', 'messages', ['channel_id', 'created_at', 'id']),
+    ('ix_messages_parent_id_created_at', 'messages', ['parent_id', 'created_at']),
+    ('ix_reactions_message_id_emoji', 'reactions', ['message_id', 'emoji']),
+    ('ix_files_message_id', 'files', ['message_id']),
+    ('ix_channel_members_channel_id_user_id', 'channel_members', ['channel_id', 'user_id']),
+]
+
+# Tables as they were before the migration, with only the columns the queries touch
+SCHEMA = """
+CREATE TABLE channel_members (
+    user_id integer NOT NULL,
+    channel_id integer NOT NULL,
+    PRIMARY KEY (user_id, channel_id)
+);
+CREATE TABLE messages (
+    id serial PRIMARY KEY,
+    content text NOT NULL,
+    user_id integer NOT NULL,
+    channel_id integer NOT NULL,
+    parent_id integer,
+    replies_count integer NOT NULL DEFAULT 0,
+    created_at timestamp,
+    updated_at timestamp
+);
+CREATE INDEX ix_messages_parent_id ON messages (parent_id);
+CREATE TABLE reactions (
+    id serial PRIMARY KEY,
+    emoji varchar NOT NULL,
+    user_id integer NOT NULL,
+    message_id integer NOT NULL,
+    created_at timestamp,
+    CONSTRAINT unique_user_message_emoji UNIQUE (user_id, message_id, emoji)
+);
+CREATE TABLE files (
+    id serial PRIMARY KEY,
+    filename varchar NOT NULL,
+    size integer NOT NULL,
+    content_type varchar NOT NULL,
+    message_id integer
+);
+"""
+
+SEED = [
+    # Each user joins ~members_per_user channels
+    """
+    INSERT INTO channel_members (user_id, channel_id)
+    SELECT DISTINCT u, 1 + (random() * (:channels - 1))::int
+    FROM generate_series(1, :users) u, generate_series(1, :members_per_user)
+    ON CONFLICT DO NOTHING
+    """,
+    # Top-level messages, skewed towards low channel ids like real traffic
+    """
+    INSERT INTO messages (content, user_id, channel_id, created_at, updated_at)
+    SELECT 'message ' || i,
+           1 + (random() * (:users - 1))::int,
+           1 + floor(:channels * power(random(), 2))::int,
+           now() - (i || ' seconds')::interval,
+           now() - (i || ' seconds')::interval
+    FROM generate_series(1, :messages) i
+    """,
+    # Replies to a sample of earlier messages, in the parent's channel
+    """
+    INSERT INTO messages (content, user_id, channel_id, parent_id, created_at, updated_at)
+    SELECT 'reply', 1 + (random() * (:users - 1))::int, m.channel_id, m.id,
+           m.created_at + (r || ' seconds')::interval, m.created_at + (r || ' seconds')::interval
+    FROM messages m, generate_series(1, 5) r
+    WHERE m.id % 20 = 0
+    """,
+    """
+    INSERT INTO reactions (emoji, user_id, message_id, created_at)
+    SELECT (ARRAY['👍', '🎉', '😂', '❤️', '👀'])[1 + (random() * 4)::int],
+           1 + (random() * (:users - 1))::int, m.id, m.created_at
+    FROM messages m, generate_series(1, 3)
+    WHERE random() < 0.3
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO files (filename, size, content_type, message_id)
+    SELECT 'file-' || id || '.png', 1024, 'image/png', id
+    FROM messages WHERE id % 50 = 0
+    """,
+]
+
+# The queries behind channel pages, threads, reactions, files and membership checks
+QUERIES = {
+    "channel_latest_page": """
+        SELECT * FROM messages WHERE channel_id = :channel_id
+        ORDER BY created_at DESC, id DESC LIMIT 50
+    """,
+    "channel_page_before_cursor": """
+        SELECT * FROM messages
+        WHERE channel_id = :channel_id AND (created_at, id) < (:cursor_created_at, :cursor_id)
+        ORDER BY created_at DESC, id DESC LIMIT 50
+    """,
+    "thread_replies": """
+        SELECT * FROM messages WHERE parent_id = :parent_id ORDER BY created_at, id
+    """,
+    "page_reactions": """
+        SELECT message_id, emoji, count(id) FROM reactions
+        WHERE message_id = ANY(:message_ids) GROUP BY message_id, emoji
+    """,
+    "page_files": """
+        SELECT * FROM files WHERE message_id = ANY(:message_ids)
+    """,
+    "channel_members": """
+        SELECT user_id FROM channel_members WHERE channel_id = :channel_id
+    """,
+}
+
+def explain(conn, sql: str, params: dict, runs: int) -> dict:
+    """Run EXPLAIN ANALYZE several times; keep the median time and the last plan."""
+    times = []
+    plan = None
+    for _ in range(runs):
+        plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), params).scalar()[0]
+        times.append(plan["Execution Time"])
+    return {"execution_ms": statistics.median(times), "plan": plan}
+
+def node_types(plan: dict) -> list:
+    """List the plan's node types, depth first."""
+    node = plan["Plan"]
+    stack, found = [node], []
+    while stack:
+        node = stack.pop()
+        found.append(node["Node Type"] + (f" ({node['Index Name']})" if "Index Name" in node else ""))
+        stack.extend(reversed(node.get("Plans", [])))
+    return found
+
+def query_params(conn) -> dict:
+    """Pick realistic parameters: the busiest channel and a mid-history cursor."""
+    channel_id = conn.execute(text(
+        "SELECT channel_id FROM messages GROUP BY channel_id ORDER BY count(*) DESC LIMIT 1"
+    )).scalar()
+    cursor = conn.execute(text(
+        "SELECT created_at, id FROM messages WHERE channel_id = :c "
+        "ORDER BY created_at DESC, id DESC OFFSET 5000 LIMIT 1"
+    ), {"c": channel_id}).first() or conn.execute(text(
+        "SELECT created_at, id FROM messages WHERE channel_id = :c ORDER BY created_at LIMIT 1"
+    ), {"c": channel_id}).first()
+    parent_id = conn.execute(text(
+        "SELECT parent_id FROM messages WHERE parent_id IS NOT NULL LIMIT 1"
+    )).scalar()
+    message_ids = conn.execute(text(
+        "SELECT id FROM messages WHERE channel_id = :c ORDER BY created_at DESC, id DESC LIMIT 50"
+    ), {"c": channel_id}).scalars().all()
+    return {
+        "channel_id": channel_id,
+        "cursor_created_at": cursor[0],
+        "cursor_id": cursor[1],
+        "parent_id": parent_id,
+        "message_ids": list(message_ids),
+    }
+
+def run_queries(conn, params: dict, runs: int) -> dict:
+    return {name: explain(conn, sql, params, runs) for name, sql in QUERIES.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv(
+        "DATABASE_URL", "postgresql://postgres:postgres@db:5432/chat_db"))
+    parser.add_argument("--schema", default="bench_indexes")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--members-per-user", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default="index_plans.json")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded schema")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    sizes = {
+        "users": args.users,
+        "channels": args.channels,
+        "members_per_user": args.members_per_user,
+        "messages": args.messages,
+    }
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA "{args.schema}"'))
+        conn.execute(text(f'SET search_path TO "{args.schema}"'))
+        try:
+            print("Seeding...")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(text(statement))
+            for statement in SEED:
+                conn.execute(text(statement), sizes)
+            conn.execute(text("ANALYZE"))
+            params = query_params(conn)
+
+            print("Running queries before indexes...")
+            before = run_queries(conn, params, args.runs)
+
+            print("Creating indexes...")
+            for name, table, columns in INDEXES:
+                conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+            conn.execute(text("DROP INDEX ix_messages_parent_id"))
+            conn.execute(text("ANALYZE"))
+
+            print("Running queries after indexes...")
+            after = run_queries(conn, params, args.runs)
+        finally:
+            if not args.keep:
+                conn.execute(text(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE'))
+
+    print(f"\n{'query':<28}{'before ms':>12}{'after ms':>12}  plan after")
+    for name in QUERIES:
+        print(f"{name:<28}{before[name]['execution_ms']:>12.2f}{after[name]['execution_ms']:>12.2f}  "
+              f"{' > '.join(node_types(after[name]['plan']))}")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "sizes": sizes,
+            "params": {**params, "cursor_created_at": str(params["cursor_created_at"])},
+            "before": before,
+            "after": after,
+        }, f, indent=2, default=str)
+    print(f"\nFull plans written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare pub/sub traffic per node for channel and node routing.
+
+Starts several RedisManager instances against the configured Redis, spreads
+users across them and broadcasts to channels with a handful of members
+each. Reports how many messages and bytes each node's subscriber received
+in REALTIME_ROUTING "channel" mode and in "node" mode, and how many pub/sub
+topics each node holds.
+
+    python scripts/bench_routing.py --nodes 8 --users 400 --channels 200 --messages 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+# Import the realtime modules the way the tests and the container do, with webapp/api on the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.redis_manager import RedisManager
+
+class NullSocket:
+    """Stand-in WebSocket that accepts frames and discards them."""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def send_json(self, data):
+        pass
+
+def make_node(manager_cls, routing: str, server_id: str):
+    """Build an independent manager, bypassing the per-process singleton."""
+    node = object.__new__(manager_cls)
+    node._initialized = False
+    node._background_tasks = []
+    manager_cls.__init__(node)
+    node.server_id = server_id
+    node.routing = routing
+    return node
+
+async def run_mode(manager_cls, routing: str, args) -> list:
+    rng = random.Random(args.seed)
+    nodes = [make_node(manager_cls, routing, f"bench-{routing}-{i}") for i in range(args.nodes)]
+    users = [f"bench-user-{i}" for i in range(args.users)]
+    home = {username: nodes[i % len(nodes)] for i, username in enumerate(users)}
+    channels = [f"bench-{i}" for i in range(args.channels)]
+
+    for username, node in home.items():
+        await node.connect(NullSocket(), username)
+    for channel_id in channels:
+        for username in rng.sample(users, args.members):
+            await home[username].subscribe_to_channel(username, channel_id)
+    await asyncio.sleep(0.5)
+
+    for node in nodes:
+        node.stats = {"messages_received": 0, "bytes_received": 0}
+    message = {"content": "x" * args.size, "username": "bench-user-0", "user_id": 1}
+    for i in range(args.messages):
+        await nodes[0].broadcast_to_channel(dict(message, id=i), rng.choice(channels))
+    await asyncio.sleep(1.0)
+
+    results = [
+        dict(node.stats, server_id=node.server_id, subscriptions=len(node.pubsub.channels))
+        for node in nodes
+    ]
+
+    redis = nodes[0].redis
+    for username, node in home.items():
+        await node.disconnect(username)
+    for channel_id in channels:
+        await redis.delete(f"channel:{channel_id}:stream")
+    for node in nodes:
+        await redis.delete(f"server_health:{node.server_id}")
+        await node.cleanup()
+    return results
+
+def report(routing: str, results: list):
+    total_bytes = sum(r["bytes_received"] for r in results)
+    total_messages = sum(r["messages_received"] for r in results)
+    print(f"\n{routing} routing")
+    print(f"{'node':<20}{'topics':>8}{'messages':>12}{'bytes':>14}")
+    for r in results:
+        print(f"{r['server_id']:<20}{r['subscriptions']:>8}{r['messages_received']:>12}{r['bytes_received']:>14}")
+    print(f"{'total':<20}{'':>8}{total_messages:>12}{total_bytes:>14}")
+    return total_bytes
+
+async def main(manager_cls=RedisManager):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--members", type=int, default=5, help="users per channel")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=200, help="message content length")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    totals = {}
+    for routing in ("channel", "node"):
+        totals[routing] = report(routing, await run_mode(manager_cls, routing, args))
+    if totals["node"]:
+        print(f"\nchannel/node bytes ratio: {totals['channel'] / totals['node']:.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
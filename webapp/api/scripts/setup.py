@@ -34,6 +34,10 @@ def create_database():
     
     asyncio.run(create_tables())
 
+    # The tables now match the latest migration; record that so a later
+    # `alembic upgrade head` doesn't try to re-apply it
+    subprocess.run(['alembic', 'stamp', 'head'], check=True)
+
 def main():
     try:
         os.chdir('/app')
@@ -48,7 +52,11 @@ def main():
         
         # Start the application
         print("Starting application...")
-        subprocess.run(['uvicorn', 'api.main:app', '--host', '0.0.0.0', '--port', '8000', '--reload'])
+        # Negotiate permessage-deflate explicitly with the websockets backend
+        subprocess.run([
+            'uvicorn', 'api.main:app', '--host', '0.0.0.0', '--port', '8000', '--reload',
+            '--ws', 'websockets', '--ws-per-message-deflate', 'true'
+        ])
     except Exception as e:
         print(f"Error during setup: {e}")
         sys.exit(1)
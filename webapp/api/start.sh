@@ -10,4 +10,4 @@ echo "Running database migrations..."
 alembic upgrade head
 
 echo "Starting the application..."
-uvicorn api.main:app --host 0.0.0.0 --port 8000 --reload 
\ No newline at end of file
+uvicorn api.main:app --host 0.0.0.0 --port 8000 --reload --ws websockets --ws-per-message-deflate true 
\ No newline at end of file
@@ -0,0 +1,52 @@
+import pytest
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api.database import Base
+from api.models.tables.user import User as UserTable
+from api.models.user import User
+from api.services.auth import AuthService, token_user_cache
+from api.utils.cache import TTLCache
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_ttl_cache_respects_entry_expiry():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("expired", 1, expires_at=time.time() - 1)
+    cache.set("live", 2, expires_at=time.time() + 30)
+    assert cache.get("expired") is None
+    assert cache.get("live") == 2
+    assert len(cache) == 1
+
+def test_ttl_cache_invalidate_where():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("token-1", {"id": 1})
+    cache.set("token-2", {"id": 1})
+    cache.set("token-3", {"id": 2})
+    assert cache.invalidate_where(lambda user: user["id"] == 1) == 2
+    assert cache.get("token-3") == {"id": 2}
+
+@pytest.mark.asyncio
+async def test_token_lookups_return_read_only_snapshots():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[UserTable.__table__])
+    token_user_cache.clear()
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        db.add(UserTable(username="alice", email="alice@example.com", hashed_password="x"))
+        await db.commit()
+        token = AuthService.create_access_token({"sub": "alice"})
+
+        miss = await AuthService.get_user_by_token(db, token)
+        hit = await AuthService.get_user_by_token(db, token)
+        assert isinstance(miss, User) and isinstance(hit, User)
+        assert hit == miss and hit is not miss
+    await engine.dispose()
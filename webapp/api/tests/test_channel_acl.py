@@ -0,0 +1,134 @@
+import pytest
+import pytest_asyncio
+import fakeredis
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.database import Base
+from api.models.tables.channel import Channel, channel_members
+from api.models.tables.user import User
+from api.services import channel as channel_module
+from api.services.channel import ChannelService, channel_membership_cache, channel_privacy_cache
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    monkeypatch.setattr(channel_module, "membership_version_client", None)
+    channel_membership_cache.clear()
+    channel_privacy_cache.clear()
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[User.__table__, Channel.__table__, channel_members]
+        )
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+def count_queries(session: AsyncSession) -> list:
+    statements = []
+    event.listen(
+        session.bind.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement)
+    )
+    return statements
+
+async def make_user(db: AsyncSession, username: str) -> User:
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    return user
+
+@pytest.mark.asyncio
+async def test_cached_access_checks_skip_the_database(db):
+    alice = await make_user(db, "alice")
+    public = await ChannelService.create_channel(db, "general", created_by_user=alice)
+    private = await ChannelService.create_channel(db, "secret", created_by_user=alice, is_private=True)
+
+    await ChannelService.require_channel_access(db, alice, private.id)
+    await ChannelService.require_channel_access(db, alice, public.id)
+    statements = count_queries(db)
+    for _ in range(3):
+        await ChannelService.require_channel_access(db, alice, private.id)
+        await ChannelService.require_channel_access(db, alice, public.id)
+    assert statements == []
+
+@pytest.mark.asyncio
+async def test_membership_changes_invalidate_the_cache(db):
+    alice = await make_user(db, "alice")
+    bob = await make_user(db, "bob")
+    private = await ChannelService.create_channel(db, "secret", created_by_user=alice, is_private=True)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await ChannelService.require_channel_access(db, bob, private.id)
+    assert exc_info.value.status_code == 403
+
+    await ChannelService.add_member_to_channel(db, private, bob, alice)
+    await ChannelService.require_channel_access(db, bob, private.id)
+
+    await ChannelService.leave_channel(db, private, bob)
+    assert not await ChannelService.is_member(db, bob.id, private.id)
+    with pytest.raises(HTTPException):
+        await ChannelService.require_channel_access(db, bob, private.id)
+
+@pytest.mark.asyncio
+async def test_access_check_reports_missing_channel(db):
+    alice = await make_user(db, "alice")
+    with pytest.raises(HTTPException) as exc_info:
+        await ChannelService.require_channel_access(db, alice, 999)
+    assert exc_info.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_membership_is_not_cached_from_a_lagging_replica(db, monkeypatch):
+    alice = await make_user(db, "alice")
+    private = await ChannelService.create_channel(db, "secret", created_by_user=alice, is_private=True)
+    monkeypatch.setattr(
+        channel_module, "AsyncSessionLocal",
+        sessionmaker(db.bind, class_=AsyncSession, expire_on_commit=False)
+    )
+
+    # The replica hasn't replicated the channel or its members yet
+    replica = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with replica.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[User.__table__, Channel.__table__, channel_members]
+        )
+    async with AsyncSession(replica, info={"replica": True}) as replica_db:
+        await ChannelService.require_channel_access(replica_db, alice, private.id)
+    await replica.dispose()
+    assert channel_membership_cache.get(alice.id) == (0, frozenset({private.id}))
+
+@pytest.mark.asyncio
+async def test_membership_changes_reach_other_workers(db, monkeypatch):
+    monkeypatch.setattr(
+        channel_module, "membership_version_client", fakeredis.aioredis.FakeRedis(decode_responses=True)
+    )
+    alice = await make_user(db, "alice")
+    bob = await make_user(db, "bob")
+    private = await ChannelService.create_channel(db, "secret", created_by_user=alice, is_private=True)
+    await ChannelService.add_member_to_channel(db, private, bob, alice)
+    await ChannelService.require_channel_access(db, bob, private.id)
+
+    # Another worker removes bob; this worker only sees the version bump
+    await db.execute(channel_members.delete().where(channel_members.c.user_id == bob.id))
+    await db.commit()
+    await channel_module.membership_version_client.incr(f"membership_version:{bob.id}")
+    with pytest.raises(HTTPException) as exc_info:
+        await ChannelService.require_channel_access(db, bob, private.id)
+    assert exc_info.value.status_code == 403
+
+@pytest.mark.asyncio
+async def test_cached_non_member_is_rechecked_before_refusing(db):
+    alice = await make_user(db, "alice")
+    bob = await make_user(db, "bob")
+    private = await ChannelService.create_channel(db, "secret", created_by_user=alice, is_private=True)
+    with pytest.raises(HTTPException):
+        await ChannelService.require_channel_access(db, bob, private.id)
+
+    # Added by another worker, whose invalidation this worker never saw
+    await db.execute(channel_members.insert().values(channel_id=private.id, user_id=bob.id))
+    await db.commit()
+    await ChannelService.require_channel_access(db, bob, private.id)
@@ -0,0 +1,126 @@
+import pytest
+import pytest_asyncio
+import hashlib
+import io
+from fastapi import UploadFile
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+
+from api.database import Base
+from api.models.tables.file import File as FileTable
+from api.models.tables.user import User
+from api.services.file import FileService
+from api.utils.files import FileTooLargeError, blob_path, content_disposition, move_to_blob, parse_range_header, save_upload
+
+@compiles(UUID, "sqlite")
+def compile_uuid_for_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    # Advisory locks are Postgres-only; sqlite serializes writers anyway
+    async def no_lock(db, sha256):
+        pass
+    monkeypatch.setattr(FileService, "lock_blob", no_lock)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[User.__table__, FileTable.__table__])
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(User(id=1, username="alice", email="alice@example.com", hashed_password="x"))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+async def add_references(db: AsyncSession, blob, count: int) -> list:
+    files = [
+        FileTable(filename=f"copy-{i}.bin", filepath=str(blob), sha256="ab" * 32,
+                  content_type="application/octet-stream", size=4, user_id=1)
+        for i in range(count)
+    ]
+    db.add_all(files)
+    await db.commit()
+    return files
+
+def make_upload(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="test.bin")
+
+@pytest.mark.asyncio
+async def test_save_upload_streams_to_disk(tmp_path):
+    data = b"chunked upload " * 1000
+    stored = await save_upload(make_upload(data), tmp_path / "test.bin", max_size=len(data), chunk_size=1024)
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.path.read_bytes() == data
+
+@pytest.mark.asyncio
+async def test_save_upload_rejects_oversized_file(tmp_path):
+    destination = tmp_path / "too_big.bin"
+    with pytest.raises(FileTooLargeError):
+        await save_upload(make_upload(b"x" * 4096), destination, max_size=1000, chunk_size=512)
+    assert not destination.exists()
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_one_blob(tmp_path):
+    paths = []
+    for name in ("first.bin", "second.bin"):
+        stored = await save_upload(make_upload(b"same bytes"), tmp_path / name, max_size=1024)
+        paths.append(await move_to_blob(stored, tmp_path))
+    assert paths[0] == paths[1] == blob_path(tmp_path, hashlib.sha256(b"same bytes").hexdigest())
+    assert paths[0].read_bytes() == b"same bytes"
+    assert not (tmp_path / "first.bin").exists()
+
+def test_parse_range_header():
+    assert parse_range_header("bytes=0-9", 100) == (0, 9)
+    assert parse_range_header("bytes=90-", 100) == (90, 99)
+    assert parse_range_header("bytes=-10", 100) == (90, 99)
+    assert parse_range_header("bytes=50-500", 100) == (50, 99)
+    # Multiple or malformed ranges fall back to the full file
+    assert parse_range_header("bytes=0-1,5-6", 100) is None
+    assert parse_range_header("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range_header("bytes=100-", 100)
+
+def test_content_disposition_encodes_unsafe_names():
+    assert content_disposition("report.pdf") == 'attachment; filename="report.pdf"'
+    assert content_disposition('a"b\r\nX-Evil: 1.txt') == (
+        "attachment; filename*=utf-8''a%22b%0D%0AX-Evil%3A%201.txt"
+    )
+    assert content_disposition("résumé.pdf") == "attachment; filename*=utf-8''r%C3%A9sum%C3%A9.pdf"
+
+@pytest.mark.asyncio
+async def test_blob_is_unlinked_with_its_last_reference(db, tmp_path):
+    blob = tmp_path / "blob"
+    blob.write_bytes(b"data")
+    first, second = await add_references(db, blob, 2)
+
+    await FileService.delete_file(db, first)
+    assert blob.exists()
+    await FileService.delete_file(db, second)
+    assert not blob.exists()
+
+@pytest.mark.asyncio
+async def test_discarded_upload_keeps_a_referenced_blob(db, tmp_path):
+    blob = tmp_path / "blob"
+    blob.write_bytes(b"data")
+    await add_references(db, blob, 1)
+
+    await FileService.discard_upload(db, "ab" * 32, str(blob))
+    assert blob.exists()
+    orphan = tmp_path / "orphan"
+    orphan.write_bytes(b"other")
+    await FileService.discard_upload(db, "cd" * 32, str(orphan))
+    assert not orphan.exists()
+
+@pytest.mark.asyncio
+async def test_failed_delete_keeps_the_blob(db, tmp_path, monkeypatch):
+    blob = tmp_path / "blob"
+    blob.write_bytes(b"data")
+    (file,) = await add_references(db, blob, 1)
+
+    async def failing_commit():
+        raise RuntimeError("commit failed")
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        await FileService.delete_file(db, file)
+    assert blob.exists()
@@ -0,0 +1,54 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.core.config import settings
+from api.database import InstrumentedQueuePool
+from api.routes.internal import verify_internal_token
+from api.utils.metrics import Histogram
+
+def test_histogram_reports_cumulative_buckets():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 2.0):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 4
+    assert snapshot["max"] == 2.0
+    assert snapshot["buckets"] == {"le_0.01": 1, "le_0.1": 3, "le_1.0": 3, "le_inf": 4}
+
+@pytest.mark.asyncio
+async def test_pool_metrics_are_kept_per_engine():
+    def make_engine():
+        return create_async_engine(
+            "sqlite+aiosqlite:///:memory:", poolclass=InstrumentedQueuePool,
+            pool_size=1, max_overflow=0, pool_timeout=0.05
+        )
+
+    busy, idle = make_engine(), make_engine()
+    try:
+        async with busy.connect():
+            with pytest.raises(PoolTimeoutError):
+                async with busy.connect():
+                    pass
+        async with idle.connect():
+            pass
+        assert busy.pool.timeouts == 1
+        assert busy.pool.wait_histogram.snapshot()["count"] == 2
+        assert idle.pool.timeouts == 0
+        assert idle.pool.wait_histogram.snapshot()["count"] == 1
+    finally:
+        await busy.dispose()
+        await idle.dispose()
+
+def test_internal_routes_fail_closed(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", None)
+    with pytest.raises(HTTPException) as exc_info:
+        verify_internal_token("anything")
+    assert exc_info.value.status_code == 404
+
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "s3cret")
+    with pytest.raises(HTTPException) as exc_info:
+        verify_internal_token(None)
+    assert exc_info.value.status_code == 403
+    verify_internal_token("s3cret")
@@ -0,0 +1,138 @@
+import pytest
+import asyncio
+import json
+
+from utils import websocket as ws_module
+from utils.websocket import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, data):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+@pytest.fixture
+def manager():
+    ConnectionManager._instance = None
+    ConnectionManager._initialized = False
+    return ConnectionManager()
+
+@pytest.mark.asyncio
+async def test_broadcast_does_not_wait_for_slow_client(manager):
+    fast, slow = FakeWebSocket(), FakeWebSocket(delay=1)
+    await manager.connect(fast, "fast")
+    await manager.connect(slow, "slow")
+    await manager.subscribe_to_channel("fast", "1")
+    await manager.subscribe_to_channel("slow", "1")
+
+    await asyncio.wait_for(manager.broadcast_to_channel({"n": 1}, "1"), timeout=0.1)
+    await asyncio.sleep(0.01)
+    assert fast.sent == [{"n": 1}]
+    assert slow.sent == []
+    await manager.disconnect(fast)
+    await manager.disconnect(slow)
+
+@pytest.mark.asyncio
+async def test_slow_client_is_closed_when_queue_fills(manager, monkeypatch):
+    monkeypatch.setattr(ws_module, "OUTBOUND_QUEUE_SIZE", 2)
+    slow = FakeWebSocket(delay=1)
+    await manager.connect(slow, "slow")
+    await manager.subscribe_to_channel("slow", "1")
+
+    for n in range(5):
+        await manager.broadcast_to_channel({"n": n}, "1")
+    await asyncio.sleep(0.01)
+    assert slow.closed_with == ws_module.SLOW_CLIENT_CLOSE_CODE
+    assert not manager.is_connected("slow")
+
+@pytest.mark.asyncio
+async def test_drop_policy_keeps_newest_messages(manager):
+    ws = FakeWebSocket()
+    outbox = ws_module.Outbox(ws, "user", maxsize=2)
+    for n in range(4):
+        assert outbox.offer(json.dumps({"n": n}), policy="drop")
+    assert outbox.dropped == 2
+    await asyncio.sleep(0.01)
+    assert ws.sent == [{"n": 2}, {"n": 3}]
+    outbox.close()
+    await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_outbox_sends_bytes_and_reports_failures():
+    ws = FakeWebSocket()
+    failures = []
+
+    async def on_error():
+        failures.append(outbox.username)
+
+    outbox = ws_module.Outbox(ws, "user", on_error=on_error)
+    outbox.offer(b"\x81\xa1n\x01")
+    await asyncio.sleep(0.01)
+    assert ws.sent == [b"\x81\xa1n\x01"]
+
+    async def fail(data):
+        raise RuntimeError("gone")
+
+    ws.send_text = fail
+    outbox.offer('{"n":1}')
+    await asyncio.sleep(0.01)
+    assert failures == ["user"]
+    assert outbox.task.done()
+
+@pytest.mark.asyncio
+async def test_outbox_reports_a_stalled_send():
+    outbox = ws_module.Outbox(FakeWebSocket(delay=1), "user")
+    assert not outbox.stalled(0.01)
+    outbox.offer('{"n":1}')
+    await asyncio.sleep(0.03)
+    assert outbox.stalled(0.01)
+    outbox.close()
+    await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_batched_outbox_sends_one_array_per_window():
+    ws = FakeWebSocket()
+    outbox = ws_module.Outbox(ws, "user", flush_interval=0.01)
+    outbox.offer('{"n":1}')
+    outbox.offer('{"n":2}')
+    await asyncio.sleep(0)
+    assert ws.sent == []
+    await asyncio.sleep(0.03)
+    assert ws.sent == [[{"n": 1}, {"n": 2}]]
+
+    outbox.offer('{"n":3}')
+    await asyncio.sleep(0.03)
+    assert ws.sent[-1] == [{"n": 3}]
+    outbox.close()
+    await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_batched_outbox_keeps_its_bound_and_order():
+    ws = FakeWebSocket(delay=0.05)
+    outbox = ws_module.Outbox(ws, "user", maxsize=4, flush_interval=0.001)
+    accepted = sum(outbox.offer(json.dumps({"n": n})) for n in range(20))
+    assert accepted < 20
+    await asyncio.sleep(0.02)
+    assert outbox.stalled(0.01)
+
+    outbox.close()
+    batched = ws_module.Outbox(FakeWebSocket(), "user", flush_interval=0.001)
+    for n in range(10):
+        batched.offer(json.dumps({"n": n}))
+        await asyncio.sleep(0.0005)
+    await asyncio.sleep(0.02)
+    frames = [frame["n"] for batch in batched.websocket.sent for frame in batch]
+    assert frames == list(range(10))
+    batched.close()
+    await asyncio.sleep(0)
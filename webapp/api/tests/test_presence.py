@@ -0,0 +1,29 @@
+import pytest
+import fakeredis
+
+from api.services.presence import InMemoryPresenceStore, RedisPresenceStore
+
+@pytest.mark.asyncio
+async def test_in_memory_presence_reports_recent_heartbeats():
+    store = InMemoryPresenceStore(timeout_seconds=5)
+    await store.heartbeat(1)
+    await store.heartbeat(2)
+    assert await store.online_among([1, 2, 3]) == {1, 2}
+    assert await store.online_among([]) == set()
+
+@pytest.mark.asyncio
+async def test_in_memory_presence_expires_after_timeout():
+    store = InMemoryPresenceStore(timeout_seconds=5)
+    await store.heartbeat(1)
+    store.last_seen[1] -= 10
+    assert await store.online_among([1]) == set()
+
+@pytest.mark.asyncio
+async def test_redis_presence_throttles_heartbeats_with_a_bounded_cache():
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    store = RedisPresenceStore(client, heartbeat_interval=60, throttle_max_size=2)
+    for user_id in (1, 1, 2, 3):
+        await store.heartbeat(user_id)
+    assert store._heartbeats == 3
+    assert len(store._recently_sent) == 2
+    assert await store.online_among([1, 2, 3, 4]) == {1, 2, 3}
@@ -0,0 +1,42 @@
+import pytest
+import pytest_asyncio
+
+import fakeredis
+
+from utils.redis_manager import RedisManager
+
+@pytest_asyncio.fixture
+async def manager():
+    RedisManager._instance = None
+    RedisManager._initialized = False
+    RedisManager._background_tasks = []
+    manager = RedisManager()
+    manager.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    manager.pool = manager.redis.connection_pool
+    manager.pubsub = manager.redis.pubsub()
+    yield manager
+    await manager.cleanup()
+    RedisManager._instance = None
+    RedisManager._initialized = False
+
+async def route(manager: RedisManager, username: str, server_id: str, channel_id: str):
+    await manager.redis.hset("user_servers", username, server_id)
+    await manager.redis.sadd(f"user:{username}:channels", channel_id)
+    await manager.redis.sadd(f"channel:{channel_id}:users", username)
+
+@pytest.mark.asyncio
+async def test_purge_removes_users_still_on_the_dead_server(manager):
+    await route(manager, "alice", "dead", "1")
+    assert await manager._purge_users([("alice", "dead")]) == 1
+    assert await manager.redis.hget("user_servers", "alice") is None
+    assert await manager.redis.smembers("channel:1:users") == set()
+    assert not await manager.redis.exists("user:alice:channels")
+
+@pytest.mark.asyncio
+async def test_purge_keeps_users_that_reconnected_since_the_scan(manager):
+    await route(manager, "alice", "dead", "1")
+    # alice reconnects elsewhere after the reaper scanned the old mapping
+    await route(manager, "alice", "live", "1")
+    assert await manager._purge_users([("alice", "dead")]) == 0
+    assert await manager.redis.hget("user_servers", "alice") == "live"
+    assert await manager.redis.smembers("channel:1:users") == {"alice"}
@@ -0,0 +1,78 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import json
+
+import fakeredis
+
+from utils import redis_manager as redis_manager_module
+from utils.redis_manager import RedisManager
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+@pytest_asyncio.fixture
+async def manager():
+    RedisManager._instance = None
+    RedisManager._initialized = False
+    RedisManager._background_tasks = []
+    manager = RedisManager()
+    manager.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    manager.pool = manager.redis.connection_pool
+    manager.pubsub = manager.redis.pubsub()
+    yield manager
+    await manager.cleanup()
+    RedisManager._instance = None
+    RedisManager._initialized = False
+
+async def replayed(ws: FakeWebSocket) -> list:
+    await asyncio.sleep(0.01)
+    frames = [frame for frame in ws.sent if frame.get("type") != "ping"]
+    ws.sent.clear()
+    return frames
+
+@pytest.mark.asyncio
+async def test_connect_subscribes_channels_and_resume_replays_them(manager):
+    stream_ids = [await manager.broadcast_to_channel({"n": n}, "1") for n in range(4)]
+    await manager.broadcast_to_channel({"n": "secret"}, "2")
+
+    ws = FakeWebSocket()
+    await manager.connect(ws, "alice", channel_ids=["1"])
+    assert "alice" in manager.local_channels["1"]
+    await replayed(ws)
+
+    assert await manager.resume("alice", {"1": stream_ids[1], "2": "0"}) == 2
+    frames = await replayed(ws)
+    assert [frame["n"] for frame in frames] == [2, 3]
+    assert [frame["stream_id"] for frame in frames] == stream_ids[2:]
+
+@pytest.mark.asyncio
+async def test_resume_reports_a_history_gap(manager, monkeypatch):
+    monkeypatch.setattr(redis_manager_module.settings, "CHANNEL_HISTORY_SIZE", 3)
+    stream_ids = [await manager.broadcast_to_channel({"n": n}, "1") for n in range(6)]
+
+    ws = FakeWebSocket()
+    await manager.connect(ws, "alice", channel_ids=["1"])
+    await replayed(ws)
+
+    # More entries missed than the replay covers
+    assert await manager.resume("alice", {"1": stream_ids[0]}) == 0
+    assert await replayed(ws) == [{"type": "history_gap", "channel_id": "1"}]
+
+    # last_id is older than anything the stream still holds
+    await manager.redis.xtrim("channel:1:stream", maxlen=2)
+    assert await manager.resume("alice", {"1": stream_ids[2]}) == 0
+    assert await replayed(ws) == [{"type": "history_gap", "channel_id": "1"}]
+
+    assert await manager.resume("alice", {"1": stream_ids[4]}) == 1
+    assert [frame["n"] for frame in await replayed(ws)] == [5]
@@ -0,0 +1,27 @@
+import json
+import pytest
+
+from utils.serialization import dumps, loads, pack_array, pack_frame, with_field
+
+def test_dumps_round_trips_compact_json():
+    payload = dumps({"content": "hi", "channel_id": 1})
+    assert " " not in payload
+    assert loads(payload) == {"content": "hi", "channel_id": 1}
+
+def test_with_field_adds_key_without_reencoding():
+    assert json.loads(with_field(dumps({"content": "hi"}), "stream_id", "1-0")) == {
+        "stream_id": "1-0",
+        "content": "hi",
+    }
+    assert json.loads(with_field("{}", "stream_id", "1-0")) == {"stream_id": "1-0"}
+
+def test_pack_frame_uses_short_keys():
+    msgpack = pytest.importorskip("msgpack")
+    frame = dumps({"content": "hi", "channel_id": 1, "custom": True})
+    assert msgpack.unpackb(pack_frame(frame)) == {"c": "hi", "ch": 1, "custom": True}
+
+def test_pack_array_matches_msgpack_array():
+    msgpack = pytest.importorskip("msgpack")
+    for count in (1, 15, 16, 70000):
+        frames = [msgpack.packb({"n": n}) for n in range(count)]
+        assert msgpack.unpackb(pack_array(frames)) == [{"n": n} for n in range(count)]
@@ -0,0 +1,43 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from api.utils.workers import BoundedExecutor
+
+@pytest.mark.asyncio
+async def test_bounded_executor_limits_concurrency():
+    pool = BoundedExecutor("test", max_workers=4, max_concurrency=2)
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return threading.current_thread().name
+
+    names = await asyncio.gather(*(pool.run(work) for _ in range(6)))
+    assert peak <= 2
+    assert all(name.startswith("test") for name in names)
+    stats = pool.stats()
+    assert stats["completed"] == 6
+    assert stats["in_flight"] == 0
+    pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_bounded_executor_counts_failures():
+    pool = BoundedExecutor("test", max_workers=1, max_concurrency=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await pool.run(fail)
+    assert pool.stats()["failed"] == 1
+    pool.shutdown()
@@ -1,13 +1,35 @@
 import redis
-import json
+import redis.asyncio as aioredis
 import logging
-from typing import Optional, Dict, Set
+import re
+from typing import Optional, Dict, Iterable, Set
 from fastapi import WebSocket
 import asyncio
-from ..core.config import settings
+from api.core.config import settings
+from .serialization import dumps, loads, pack_frame, with_field
+from .websocket import Outbox, SLOW_CLIENT_CLOSE_CODE, SLOW_CLIENT_POLICY
 
 logger = logging.getLogger(__name__)
 
+# Redis stream entry IDs: "<ms>-<seq>", or just "<ms>"
+STREAM_ID_PATTERN = re.compile(r"^\d+(-\d+)?$")
+
+# Purge one user's routing and subscription state, but only if they are
+# still mapped to the server the reaper saw; checked and deleted atomically
+# so a reconnect in between keeps its fresh entry.
+# KEYS: user_servers, user:<username>:channels  ARGV: username, server_id
+PURGE_USER_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+for _, channel in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    redis.call('SREM', 'channel:' .. channel .. ':users', ARGV[1])
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
 class RedisManager:
     _instance = None
     _initialized = False
@@ -21,21 +43,35 @@ class RedisManager:
     def __init__(self):
         if not self._initialized:
             self._initialized = True
-            # Redis for pub/sub and data storage
-            self.redis = redis.Redis(
+            # Redis for pub/sub and data storage, sharing one connection pool
+            self.pool = aioredis.ConnectionPool(
                 host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
+                port=int(settings.REDIS_PORT),
                 db=0,
-                decode_responses=True
+                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS
             )
+            self.redis = aioredis.Redis(connection_pool=self.pool)
             self.pubsub = self.redis.pubsub()
             
             # Keep WebSocket connections local (only for this instance)
             self.local_connections: Dict[str, WebSocket] = {}
+            # Frame encoding negotiated by each local user ("json" or "msgpack")
+            self.local_encodings: Dict[str, str] = {}
+            # Per-connection send queues, so one slow socket never stalls fan-out
+            self.local_outboxes: Dict[str, Outbox] = {}
+            # channel_id -> usernames connected to this instance, so fan-out
+            # never has to ask Redis who is subscribed
+            self.local_channels: Dict[str, Set[str]] = {}
             self.server_id = settings.SERVER_ID  # Unique ID for this server instance
+            self.routing = settings.REALTIME_ROUTING
+            # Pub/sub traffic received by this instance
+            self.stats = {"messages_received": 0, "bytes_received": 0}
 
     async def initialize(self):
         """Initialize async components"""
+        # No awaits between the check and creating the tasks, so concurrent
+        # connects can't both start them
         if not hasattr(self, '_subscriber_task'):
             self._subscriber_task = asyncio.create_task(self.start_subscriber())
             self._health_check_task = asyncio.create_task(self.health_check())
@@ -51,16 +87,43 @@ class RedisManager:
                 except asyncio.CancelledError:
                     pass
         self._background_tasks.clear()
+        for outbox in self.local_outboxes.values():
+            outbox.close()
+        self.local_outboxes.clear()
+        await self.pubsub.close()
+        await self.redis.close()
+        await self.pool.disconnect()
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        username: str,
+        encoding: str = "json",
+        flush_interval: Optional[float] = None,
+        channel_ids: Iterable[str] = ()
+    ):
+        """Connect a new WebSocket client and subscribe it to channel_ids.
 
-    async def connect(self, websocket: WebSocket, username: str):
-        """Connect a new WebSocket client"""
+        Callers pass the channels the user may read. With a flush_interval,
+        frames queued within each window are sent as one array frame.
+        """
         logger.info(f"New WebSocket connection from user: {username}")
         await websocket.accept()
+        previous = self.local_outboxes.pop(username, None)
+        if previous:
+            previous.close()
         self.local_connections[username] = websocket
+        self.local_encodings[username] = encoding
+        self.local_outboxes[username] = Outbox(
+            websocket, username,
+            on_error=lambda: self._drop_failed_connection(username, websocket),
+            flush_interval=flush_interval
+        )
         
         # Store user's server instance ID in Redis
-        self.redis.hset("user_servers", username, self.server_id)
+        await self.redis.hset("user_servers", username, self.server_id)
         logger.debug(f"Stored server mapping for user {username}: {self.server_id}")
+        await self.subscribe_to_channels(username, channel_ids)
         
         # Ensure background tasks are running
         await self.initialize()
@@ -70,105 +133,296 @@ class RedisManager:
         logger.info(f"Disconnecting user: {username}")
         try:
             # Remove local connection first
-            self.local_connections.pop(username, None)
+            self._drop_local_connection(username)
             
-            # Remove server mapping
-            self.redis.hdel("user_servers", username)
+            # Get all channels, then drop the server mapping and every
+            # subscription in one pipeline: two round trips in total
+            channels = await self.redis.smembers(f"user:{username}:channels")
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hdel("user_servers", username)
+                for channel in channels:
+                    pipe.srem(f"channel:{channel}:users", username)
+                pipe.delete(f"user:{username}:channels")
+                await pipe.execute()
             
-            # Get all channels before removing subscriptions
-            channels = list(self.redis.smembers(f"user:{username}:channels"))
-            
-            # Remove from all channel subscriptions
-            for channel in channels:
-                try:
-                    await self.unsubscribe_from_channel(username, channel)
-                except Exception as e:
-                    logger.error(f"Error unsubscribing {username} from channel {channel}: {e}")
-                    # Force remove the subscription
-                    self.redis.srem(f"channel:{channel}:users", username)
-                    self.redis.srem(f"user:{username}:channels", channel)
-            
-            # Final cleanup - ensure all user data is removed
-            self.redis.delete(f"user:{username}:channels")
+            await self._drop_local_subscriptions(username)
             
         except Exception as e:
             logger.error(f"Error during disconnect cleanup for {username}: {e}")
             # Attempt force cleanup
             try:
-                self.local_connections.pop(username, None)
-                self.redis.hdel("user_servers", username)
-                self.redis.delete(f"user:{username}:channels")
+                self._drop_local_connection(username)
+                await self._drop_local_subscriptions(username)
+                await self.redis.hdel("user_servers", username)
+                await self.redis.delete(f"user:{username}:channels")
             except:
                 pass
 
     async def subscribe_to_channel(self, username: str, channel_id: str):
         """Subscribe a user to a channel"""
-        logger.info(f"Subscribing user {username} to channel {channel_id}")
-        # Store subscription in Redis
-        self.redis.sadd(f"channel:{channel_id}:users", username)
-        self.redis.sadd(f"user:{username}:channels", channel_id)
+        await self.subscribe_to_channels(username, [channel_id])
+
+    async def subscribe_to_channels(self, username: str, channel_ids: Iterable[str]):
+        """Subscribe a user to several channels in one round trip"""
+        channel_ids = [str(channel_id) for channel_id in channel_ids]
+        if not channel_ids:
+            return
+        logger.info(f"Subscribing user {username} to channels {channel_ids}")
+        # Store subscriptions in Redis
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for channel_id in channel_ids:
+                pipe.sadd(f"channel:{channel_id}:users", username)
+            pipe.sadd(f"user:{username}:channels", *channel_ids)
+            await pipe.execute()
         
-        # Subscribe to Redis channel
-        self.pubsub.subscribe(f"channel:{channel_id}")
-        logger.debug(f"Subscribed to Redis channel: channel:{channel_id}")
+        # Subscribe to the Redis channels whose first local user this is
+        new_channels = []
+        for channel_id in channel_ids:
+            local_users = self.local_channels.setdefault(channel_id, set())
+            if not local_users:
+                new_channels.append(f"channel:{channel_id}")
+            local_users.add(username)
+        # In node routing, messages arrive on this server's own topic instead
+        if new_channels and self.routing != "node":
+            await self.pubsub.subscribe(*new_channels)
+            logger.debug(f"Subscribed to Redis channels: {new_channels}")
 
     async def unsubscribe_from_channel(self, username: str, channel_id: str):
         """Unsubscribe a user from a channel"""
-        logger.info(f"Unsubscribing user {username} from channel {channel_id}")
-        self.redis.srem(f"channel:{channel_id}:users", username)
-        self.redis.srem(f"user:{username}:channels", channel_id)
+        await self.unsubscribe_from_channels(username, [channel_id])
+
+    async def unsubscribe_from_channels(self, username: str, channel_ids: Iterable[str]):
+        """Unsubscribe a user from several channels in one round trip"""
+        channel_ids = [str(channel_id) for channel_id in channel_ids]
+        if not channel_ids:
+            return
+        logger.info(f"Unsubscribing user {username} from channels {channel_ids}")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for channel_id in channel_ids:
+                pipe.srem(f"channel:{channel_id}:users", username)
+            pipe.srem(f"user:{username}:channels", *channel_ids)
+            await pipe.execute()
         
-        # If no more users in channel, unsubscribe from Redis channel
-        if not self.redis.scard(f"channel:{channel_id}:users"):
-            self.pubsub.unsubscribe(f"channel:{channel_id}")
+        # If no more local users in a channel, unsubscribe from its Redis channel
+        empty_channels = []
+        for channel_id in channel_ids:
+            local_users = self.local_channels.get(channel_id)
+            if local_users is not None:
+                local_users.discard(username)
+                if not local_users:
+                    del self.local_channels[channel_id]
+                    empty_channels.append(f"channel:{channel_id}")
+        if empty_channels and self.routing != "node":
+            await self.pubsub.unsubscribe(*empty_channels)
+
+    async def _drop_local_subscriptions(self, username: str):
+        """Remove a user from the local channel index"""
+        empty_channels = []
+        for channel_id in list(self.local_channels):
+            users = self.local_channels[channel_id]
+            users.discard(username)
+            if not users:
+                del self.local_channels[channel_id]
+                empty_channels.append(f"channel:{channel_id}")
+        if empty_channels and self.routing != "node":
+            await self.pubsub.unsubscribe(*empty_channels)
 
-    async def broadcast_to_channel(self, message: dict, channel_id: str):
-        """Broadcast a message to all users in a channel"""
+    async def broadcast_to_channel(self, message: dict, channel_id: str) -> Optional[str]:
+        """Broadcast a message to all users in a channel.
+
+        The message is appended to the channel's history stream first and
+        delivered with its stream ID as "stream_id", so clients can resume
+        from the last frame they saw. Returns the stream ID.
+        """
         logger.info(f"Broadcasting message to channel {channel_id}")
         try:
-            # Store message in Redis for history
-            self.redis.lpush(f"channel:{channel_id}:messages", json.dumps(message))
-            self.redis.ltrim(f"channel:{channel_id}:messages", 0, 99)  # Keep last 100 messages
+            # Serialize once; the same text is stored and published
+            payload = dumps(message)
+            
+            # Store message in the channel's history stream
+            stream_id = await self.redis.xadd(
+                f"channel:{channel_id}:stream",
+                {"data": payload},
+                maxlen=settings.CHANNEL_HISTORY_SIZE,
+                approximate=True
+            )
+            frame = with_field(payload, "stream_id", stream_id)
             
-            # Publish to Redis channel
-            self.redis.publish(f"channel:{channel_id}", json.dumps(message))
+            if self.routing == "node":
+                await self._publish_to_servers(frame, channel_id)
+            else:
+                # Publish to Redis channel
+                await self.redis.publish(f"channel:{channel_id}", frame)
+            return stream_id
         except redis.RedisError as e:
             logger.error(f"Redis error in broadcast_to_channel: {e}")
+            return None
+
+    async def _publish_to_servers(self, frame: str, channel_id: str):
+        """Publish a frame only to the servers that hold channel members"""
+        users = await self.redis.smembers(f"channel:{channel_id}:users")
+        if not users:
+            return
+        servers = set(await self.redis.hmget("user_servers", *users))
+        servers.discard(None)
+        
+        # Server topics carry many channels, so prefix the frame with its channel
+        envelope = f"{channel_id}\n{frame}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for server_id in servers:
+                pipe.publish(f"server:{server_id}", envelope)
+            await pipe.execute()
+
+    @staticmethod
+    def _history_frames(entries) -> list:
+        """Turn stream entries into delivered frames"""
+        return [with_field(fields["data"], "stream_id", stream_id) for stream_id, fields in entries]
 
     async def get_channel_messages(self, channel_id: str, limit: int = 50) -> list:
-        """Get recent messages from a channel"""
+        """Get recent messages from a channel, newest first"""
         try:
-            messages = self.redis.lrange(f"channel:{channel_id}:messages", 0, limit - 1)
-            return [json.loads(msg) for msg in messages]
+            entries = await self.redis.xrevrange(f"channel:{channel_id}:stream", count=limit)
+            return [loads(frame) for frame in self._history_frames(entries)]
         except redis.RedisError as e:
             logger.error(f"Redis error in get_channel_messages: {e}")
             return []
 
+    async def resume(self, username: str, last_ids: Dict[str, str]) -> int:
+        """Send a reconnecting user the frames they missed in each channel.
+
+        Frames published while the replay runs may also arrive live; clients
+        drop any frame whose stream_id is not newer than the last one they
+        saw. If the stream no longer holds everything after a last_id
+        (trimmed, or more than CHANNEL_HISTORY_SIZE entries missed), nothing
+        is replayed for that channel and the client gets a
+        {"type": "history_gap", "channel_id": ...} event telling it to
+        refetch over REST instead.
+
+        Channels the user is not subscribed to on this server are skipped.
+        Raises ValueError for a malformed stream ID. Returns the number of
+        frames sent.
+        """
+        websocket = self.local_connections.get(username)
+        if websocket is None or not last_ids:
+            return 0
+        channel_ids = [
+            channel_id for channel_id in last_ids
+            if username in self.local_channels.get(channel_id, ())
+        ]
+        if len(channel_ids) < len(last_ids):
+            logger.warning(f"User {username} tried to resume channels they are not subscribed to")
+        for channel_id in channel_ids:
+            if not STREAM_ID_PATTERN.match(str(last_ids[channel_id])):
+                raise ValueError(f"Invalid stream id for channel {channel_id}: {last_ids[channel_id]!r}")
+        if not channel_ids:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for channel_id in channel_ids:
+                stream = f"channel:{channel_id}:stream"
+                # One extra entry tells us whether more were missed than we replay
+                pipe.xrange(stream, min=f"({last_ids[channel_id]}", count=settings.CHANNEL_HISTORY_SIZE + 1)
+                pipe.xrange(stream, count=1)
+            results = await pipe.execute()
+        sent = 0
+        for channel_id, entries, oldest in zip(channel_ids, results[::2], results[1::2]):
+            if len(entries) > settings.CHANNEL_HISTORY_SIZE or (
+                oldest and self._stream_id_key(last_ids[channel_id]) < self._stream_id_key(oldest[0][0])
+            ):
+                # Entries after last_id may have been trimmed away
+                logger.info(f"History gap resuming channel {channel_id} for {username}")
+                if not self._offer_frame(username, dumps({"type": "history_gap", "channel_id": channel_id})):
+                    return sent
+                continue
+            for frame in self._history_frames(entries):
+                if not self._offer_frame(username, frame):
+                    return sent
+                sent += 1
+        return sent
+
+    @staticmethod
+    def _stream_id_key(stream_id: str) -> tuple:
+        """Sort key for a stream ID, so IDs compare by time then sequence"""
+        ms, _, seq = str(stream_id).partition("-")
+        return int(ms), int(seq or 0)
+
+    async def send_to_user(self, username: str, message: dict):
+        """Queue a message for one local user in their negotiated encoding"""
+        self._offer_frame(username, dumps(message))
+
+    def _offer_frame(self, username: str, frame: str, packed: Optional[dict] = None) -> bool:
+        """Queue a JSON text frame on a user's outbox, re-encoded for MessagePack clients.
+
+        Never waits on the socket. Pass the same packed dict for every
+        recipient of a frame so it is packed at most once. Returns False if
+        the user has no outbox or was closed as a slow client.
+        """
+        outbox = self.local_outboxes.get(username)
+        if outbox is None:
+            return False
+        if self.local_encodings.get(username) == "msgpack":
+            if packed is None:
+                packed = {}
+            if "msgpack" not in packed:
+                packed["msgpack"] = pack_frame(frame)
+            frame = packed["msgpack"]
+        if outbox.offer(frame, SLOW_CLIENT_POLICY):
+            return True
+        logger.warning(f"Closing slow client {username}: {outbox.queue.qsize()} messages queued")
+        asyncio.create_task(self._close_slow_client(username, outbox))
+        return False
+
+    def _drop_local_connection(self, username: str):
+        """Forget a user's local socket and stop its writer"""
+        self.local_connections.pop(username, None)
+        self.local_encodings.pop(username, None)
+        outbox = self.local_outboxes.pop(username, None)
+        if outbox:
+            outbox.close()
+
+    async def _drop_failed_connection(self, username: str, websocket: WebSocket):
+        """Disconnect a user whose socket failed a send, unless they reconnected since"""
+        if self.local_connections.get(username) is websocket:
+            await self.disconnect(username)
+
+    async def _close_slow_client(self, username: str, outbox: Outbox):
+        if self.local_outboxes.get(username) is outbox:
+            await self.disconnect(username)
+        try:
+            await outbox.websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason="Client too slow")
+        except Exception:
+            pass  # Connection might already be closed
+
     async def start_subscriber(self):
         """Listen for Redis messages and forward to WebSocket clients"""
         logger.info("Starting Redis subscriber")
         try:
-            while True:
-                message = await asyncio.to_thread(self.pubsub.get_message, timeout=1)
-                if message and message['type'] == 'message':
+            # Keep one subscription open for this server so the listener
+            # always has a live pub/sub connection to block on
+            await self.pubsub.subscribe(f"server:{self.server_id}")
+            # Blocks on the pub/sub socket, so messages are handled as they arrive
+            async for message in self.pubsub.listen():
+                if message['type'] == 'message':
                     try:
-                        channel = message['channel']
-                        data = json.loads(message['data'])
-                        
-                        # Get all users subscribed to this channel
-                        users = self.redis.smembers(f"channel:{channel}:users")
+                        self.stats["messages_received"] += 1
+                        self.stats["bytes_received"] += len(message['data'])
+                        if message['channel'].startswith("server:"):
+                            channel_id, frame = message['data'].split("\n", 1)
+                        else:
+                            channel_id = message['channel'].split(":", 1)[-1]
+                            # The published payload is already JSON; forward it as-is
+                            frame = message['data']
+                        users = self.local_channels.get(channel_id)
+                        if not users:
+                            continue
                         
-                        # Send to all local users
-                        for username in users:
-                            if username in self.local_connections:
-                                try:
-                                    await self.local_connections[username].send_json(data)
-                                except Exception as e:
-                                    logger.error(f"Error sending message to user {username}: {e}")
-                                    await self.disconnect(username)
+                        # Queue for all local users (copy, disconnect mutates the set)
+                        packed = {}
+                        for username in list(users):
+                            self._offer_frame(username, frame, packed)
                     except Exception as e:
                         logger.error(f"Error processing Redis message: {e}")
-                await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error in subscriber loop: {e}")
 
@@ -177,25 +431,82 @@ class RedisManager:
         while True:
             try:
                 # Update server health
-                self.redis.setex(f"server_health:{self.server_id}", 30, "alive")
+                await self.redis.setex(
+                    f"server_health:{self.server_id}", settings.SERVER_HEALTH_TTL_SECONDS, "alive"
+                )
                 
                 # Check all local connections
-                for username, ws in list(self.local_connections.items()):
-                    try:
-                        # Try to ping the connection
-                        await ws.send_json({"type": "ping"})
-                    except Exception as e:
-                        logger.error(f"Connection dead for user {username}: {e}")
-                        await self.disconnect(username)
+                await self.ping_local_connections()
                 
-                # Clean up stale subscriptions
-                server_id = self.redis.hget("user_servers", username)
-                if server_id and server_id == self.server_id:
-                    if username not in self.local_connections:
-                        logger.warning(f"Cleaning up stale connection for user {username}")
-                        await self.disconnect(username)
+                # Clean up routing state left behind by dead servers
+                await self.reap_stale_users()
                 
-                await asyncio.sleep(10)
+                await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL_SECONDS)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Health check failed: {e}")
-                await asyncio.sleep(5)  # Shorter retry interval on failure 
\ No newline at end of file
+                await asyncio.sleep(5)  # Shorter retry interval on failure
+
+    async def ping_local_connections(self):
+        """Queue a ping for every local socket and disconnect the ones stuck on a send.
+
+        Sockets whose send fails are disconnected by their outbox writer.
+        """
+        ping, packed = dumps({"type": "ping"}), {}
+        for username, outbox in list(self.local_outboxes.items()):
+            if outbox.stalled(settings.WS_PING_TIMEOUT_SECONDS):
+                logger.error(f"Connection dead for user {username}: send blocked")
+                await self.disconnect(username)
+                continue
+            self._offer_frame(username, ping, packed)
+
+    async def reap_stale_users(self) -> int:
+        """Purge users routed to servers that stopped sending heartbeats.
+
+        Only one server reaps per interval. Users mapped to this server but
+        without a local socket are purged too. Returns the number of users
+        removed.
+        """
+        acquired = await self.redis.set(
+            "reaper_lock", self.server_id, nx=True, ex=settings.HEALTH_CHECK_INTERVAL_SECONDS
+        )
+        if not acquired:
+            return 0
+
+        alive: Dict[str, bool] = {self.server_id: True}
+        batch = []
+        reaped = 0
+        async for username, server_id in self.redis.hscan_iter(
+            "user_servers", count=settings.REAPER_BATCH_SIZE
+        ):
+            if server_id not in alive:
+                alive[server_id] = bool(await self.redis.exists(f"server_health:{server_id}"))
+            if server_id == self.server_id:
+                if username not in self.local_connections:
+                    batch.append((username, server_id))
+            elif not alive[server_id]:
+                batch.append((username, server_id))
+            if len(batch) >= settings.REAPER_BATCH_SIZE:
+                reaped += await self._purge_users(batch)
+                batch = []
+        if batch:
+            reaped += await self._purge_users(batch)
+        if reaped:
+            logger.warning(f"Reaped {reaped} stale users from dead servers")
+        return reaped
+
+    async def _purge_users(self, users) -> int:
+        """Remove routing and subscription state for a batch of (username, server_id).
+
+        Users that reconnected since the scan are skipped.
+        """
+        purge_user = self.redis.register_script(PURGE_USER_SCRIPT)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for username, server_id in users:
+                await purge_user(
+                    keys=["user_servers", f"user:{username}:channels"],
+                    args=[username, server_id],
+                    client=pipe
+                )
+            return sum(await pipe.execute())
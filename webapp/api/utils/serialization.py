@@ -0,0 +1,75 @@
+"""Encoding for broadcast frames.
+
+Frames are JSON text, produced with orjson when it is installed. Clients can
+opt into MessagePack, which uses the short top-level keys in SHORT_KEYS.
+"""
+
+import json
+import struct
+from typing import Any, List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+# Top-level field names sent to MessagePack clients
+SHORT_KEYS = {
+    "id": "i",
+    "type": "y",
+    "content": "c",
+    "channel_id": "ch",
+    "user_id": "u",
+    "username": "n",
+    "created_at": "t",
+    "updated_at": "ut",
+    "parent_id": "p",
+    "replies_count": "r",
+    "emojis": "e",
+    "emoji_counts": "ec",
+    "file": "f",
+    "stream_id": "s",
+    "error": "x",
+}
+
+def dumps(obj: Any) -> str:
+    """Serialize a message to the compact JSON text sent over WebSockets."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+def loads(data: str) -> Any:
+    """Parse a JSON text frame."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def with_field(payload: str, key: str, value: Any) -> str:
+    """Add a top-level field to a serialized JSON object without re-encoding it."""
+    field = f"{dumps(key)}:{dumps(value)}"
+    if payload == "{}":
+        return "{" + field + "}"
+    return "{" + field + "," + payload[1:]
+
+def pack_frame(frame: str) -> bytes:
+    """Re-encode a JSON text frame as MessagePack with short top-level keys."""
+    obj = loads(frame)
+    if isinstance(obj, dict):
+        obj = {SHORT_KEYS.get(key, key): value for key, value in obj.items()}
+    return msgpack.packb(obj, use_bin_type=True)
+
+def pack_array(frames: List[bytes]) -> bytes:
+    """Join packed frames into one MessagePack array without re-encoding them."""
+    count = len(frames)
+    if count < 16:
+        header = bytes([0x90 | count])
+    elif count < 2 ** 16:
+        header = b"\xdc" + struct.pack(">H", count)
+    else:
+        header = b"\xdd" + struct.pack(">I", count)
+    return header + b"".join(frames)
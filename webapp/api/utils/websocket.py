@@ -1,10 +1,103 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from typing import Awaitable, Callable, Dict, Optional, Set, Union
 import logging
 import asyncio
+import time
+from .serialization import dumps, pack_array
 
 logger = logging.getLogger(__name__)
 
+# Messages buffered per connection before it counts as a slow client
+OUTBOUND_QUEUE_SIZE = 256
+# What to do with a slow client: "close" it, or "drop" its oldest queued message
+SLOW_CLIENT_POLICY = "close"
+# Close code sent to clients that fall too far behind (1013 = try again later)
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+class Outbox:
+    """Bounded send queue for one WebSocket, drained by its own writer task.
+
+    Text frames go out with send_text and bytes frames with send_bytes. With
+    a flush_interval, the writer waits that long after the first queued
+    frame and sends everything queued by then as one array frame: joined as
+    already-serialized JSON text, or packed as a MessagePack array for
+    binary connections. Batched frames still count against the queue bound.
+
+    When a send fails the writer stops and calls on_error (by default,
+    removing the socket from the ConnectionManager).
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        username: str,
+        maxsize: Optional[int] = None,
+        on_error: Optional[Callable[[], Awaitable[None]]] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.websocket = websocket
+        self.username = username
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize or OUTBOUND_QUEUE_SIZE)
+        self.dropped = 0
+        self.on_error = on_error
+        self.flush_interval = flush_interval
+        # Monotonic time the in-flight send started, None while idle
+        self.sending_since: Optional[float] = None
+        self.task = asyncio.create_task(self._writer())
+
+    async def _writer(self):
+        while True:
+            frames = [await self.queue.get()]
+            if self.flush_interval:
+                await asyncio.sleep(self.flush_interval)
+                while not self.queue.empty():
+                    frames.append(self.queue.get_nowait())
+            self.sending_since = time.monotonic()
+            try:
+                await self._send(frames)
+            except Exception as e:
+                logger.error(f"Error sending to user {self.username}: {e}")
+                if self.on_error is not None:
+                    await self.on_error()
+                else:
+                    await ConnectionManager().disconnect(self.websocket)
+                return
+            finally:
+                self.sending_since = None
+
+    async def _send(self, frames: list):
+        if self.flush_interval:
+            if isinstance(frames[0], bytes):
+                await self.websocket.send_bytes(pack_array(frames))
+            else:
+                await self.websocket.send_text("[" + ",".join(frames) + "]")
+        elif isinstance(frames[0], bytes):
+            await self.websocket.send_bytes(frames[0])
+        else:
+            await self.websocket.send_text(frames[0])
+
+    def stalled(self, timeout: float) -> bool:
+        """Whether the current send has been blocked for longer than timeout seconds."""
+        return self.sending_since is not None and time.monotonic() - self.sending_since > timeout
+
+    def offer(self, frame: Union[str, bytes], policy: str = SLOW_CLIENT_POLICY) -> bool:
+        """Queue a frame without waiting. Returns False if the client should be closed."""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            if policy != "drop":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(frame)
+            self.dropped += 1
+            return True
+
+    def close(self):
+        # on_error may close the outbox from inside the writer, which is about to return
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+
 class ConnectionManager:
     _instance = None
     _initialized = False
@@ -18,6 +111,8 @@ class ConnectionManager:
         if not self._initialized:
             # Map username to their websocket connection
             self.active_connections: Dict[str, WebSocket] = {}
+            # Map username to its outbound queue
+            self.outboxes: Dict[str, Outbox] = {}
             # Map channel_id to set of subscribed usernames
             self.channel_subscriptions: Dict[str, Set[str]] = {}
             self._initialized = True
@@ -25,7 +120,11 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket, username: str):
         """Add a new WebSocket connection"""
         logger.debug(f"Adding WebSocket connection for user {username}")
+        previous = self.outboxes.pop(username, None)
+        if previous:
+            previous.close()
         self.active_connections[username] = websocket
+        self.outboxes[username] = Outbox(websocket, username)
         logger.debug(f"Connected users: {list(self.active_connections.keys())}")
 
     async def disconnect(self, websocket: WebSocket):
@@ -34,6 +133,9 @@ class ConnectionManager:
         for username, ws in list(self.active_connections.items()):
             if ws == websocket:
                 del self.active_connections[username]
+                outbox = self.outboxes.pop(username, None)
+                if outbox:
+                    outbox.close()
                 # Remove user from all channel subscriptions
                 for subscribers in self.channel_subscriptions.values():
                     subscribers.discard(username)
@@ -53,25 +155,35 @@ class ConnectionManager:
             self.channel_subscriptions[channel_id].discard(username)
 
     async def broadcast_to_channel(self, message: dict, channel_id: str):
-        """Broadcast a message to all users subscribed to a channel"""
-        logger.info(f"Broadcasting message to channel {channel_id}: {message}")
-        if channel_id not in self.channel_subscriptions:
-            logger.warning(f"No subscribers found for channel {channel_id}")
+        """Queue a message for all users subscribed to a channel"""
+        subscribers = self.channel_subscriptions.get(channel_id)
+        if not subscribers:
+            logger.debug(f"No subscribers found for channel {channel_id}")
             return
-            
-        for username in self.channel_subscriptions[channel_id]:
-            if username in self.active_connections:
-                logger.info(f"Sending message to user {username} in channel {channel_id}")
-                await self.active_connections[username].send_json(message)
-            else:
-                logger.warning(f"User {username} not connected but subscribed to channel {channel_id}")
+        logger.debug(f"Broadcasting message to {len(subscribers)} subscribers of channel {channel_id}")
+        self._enqueue(message, list(subscribers))
 
     async def broadcast(self, message: dict):
         logger.debug("Broadcasting message globally")
         # For backwards compatibility or global messages
-        for username, connection in self.active_connections.items():
-            logger.debug(f"Sending message to user {username}")
-            await connection.send_json(message)
+        self._enqueue(message, list(self.outboxes))
+
+    def _enqueue(self, message: dict, usernames):
+        """Hand a message to each user's writer task; never waits on a socket"""
+        # Serialize once and share the same text frame between recipients
+        frame = dumps(message)
+        for username in usernames:
+            outbox = self.outboxes.get(username)
+            if outbox and not outbox.offer(frame):
+                logger.warning(f"Closing slow client {username}: {outbox.queue.qsize()} messages queued")
+                asyncio.create_task(self._close_slow_client(outbox))
+
+    async def _close_slow_client(self, outbox: Outbox):
+        await self.disconnect(outbox.websocket)
+        try:
+            await outbox.websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason="Client too slow")
+        except Exception:
+            pass  # Connection might already be closed
 
     def is_connected(self, username: str) -> bool:
         return username in self.active_connections
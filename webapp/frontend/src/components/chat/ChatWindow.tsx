@@ -26,6 +26,22 @@ interface MessageData {
   replies_count: number;
 }
 
+interface MessagePage {
+  messages: MessageData[];
+  next_cursor: number | null;
+  prev_cursor: number | null;
+}
+
+// Merge the newest page into the loaded history. Messages inside the page's
+// time range that the page no longer contains have been deleted.
+const mergeLatestPage = (loaded: MessageData[], page: MessageData[]): MessageData[] => {
+  if (page.length === 0) return [];
+  const pageIds = new Set(page.map(m => m.id));
+  const pageStart = new Date(page[0].created_at).getTime();
+  const older = loaded.filter(m => !pageIds.has(m.id) && new Date(m.created_at).getTime() < pageStart);
+  return [...older, ...page];
+};
+
 interface ChatWindowProps {
   channelId: string;
   selectedMessageTimestamp?: string | null;
@@ -41,6 +57,8 @@ const ChatWindow: React.FC<ChatWindowProps> = ({
   const [error, setError] = useState<string | null>(null);
   const [channelName, setChannelName] = useState<string>('');
   const [showSearch, setShowSearch] = useState(false);
+  // Cursor for the next older page; undefined until the first page has loaded
+  const [olderCursor, setOlderCursor] = useState<number | null | undefined>(undefined);
   const api = useApi();
   const { token } = useAuth();
 
@@ -70,13 +88,51 @@ const ChatWindow: React.FC<ChatWindowProps> = ({
       }
       
       const data = await response.json();
-      setMessages(data);
+      // Channel history is paginated; DM history is still a plain list
+      if (Array.isArray(data)) {
+        setMessages(data);
+        setOlderCursor(null);
+      } else {
+        const page = data as MessagePage;
+        setMessages(prev => mergeLatestPage(prev, page.messages));
+        // Keep the cursor of older pages already loaded
+        setOlderCursor(prev => (prev === undefined ? page.prev_cursor : prev));
+      }
       setError(null);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch messages');
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!token || olderCursor === undefined || olderCursor === null) return;
+
+    try {
+      const response = await fetch(
+        `${API_BASE_URL}/messages/channel/${channelId}?before_id=${olderCursor}`,
+        {
+          headers: {
+            'Authorization': `Bearer ${token}`,
+            'Accept': 'application/json'
+          }
+        }
+      );
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => null);
+        throw new Error(errorData?.detail || 'Failed to fetch older messages');
+      }
+
+      const page: MessagePage = await response.json();
+      setMessages(prev => {
+        const loadedIds = new Set(prev.map(m => m.id));
+        return [...page.messages.filter(m => !loadedIds.has(m.id)), ...prev];
+      });
+      setOlderCursor(page.prev_cursor);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to fetch older messages');
+    }
+  };
+
   // Fetch channel name
   useEffect(() => {
     const fetchChannelName = async () => {
@@ -132,6 +188,12 @@ const ChatWindow: React.FC<ChatWindowProps> = ({
     }
   };
 
+  useEffect(() => {
+    // Start each channel from its newest page
+    setMessages([]);
+    setOlderCursor(undefined);
+  }, [channelId]);
+
   useEffect(() => {
     if (token) {
       fetchMessages();
@@ -191,6 +253,8 @@ const ChatWindow: React.FC<ChatWindowProps> = ({
             channelId={channelId}
             onAddReaction={handleAddReaction}
             onRemoveReaction={handleRemoveReaction}
+            onLoadMore={loadOlderMessages}
+            hasMore={olderCursor !== undefined && olderCursor !== null}
             selectedMessageTimestamp={selectedMessageTimestamp}
           />
         )}
@@ -48,6 +48,7 @@ interface MessageProps {
   channelId: string;
   createdAt: string;
   emojis: { [key: string]: string[] };
+  emojiCounts?: { [key: string]: number };
   file?: FileInfo | null;
   repliesCount?: number;
   onAddReaction: (channelId: string, messageId: string, emoji: string) => void;
@@ -63,6 +64,7 @@ const Message: React.FC<MessageProps> = ({
   channelId,
   createdAt,
   emojis,
+  emojiCounts = {},
   file,
   repliesCount = 0,
   onAddReaction,
@@ -168,8 +170,8 @@ const Message: React.FC<MessageProps> = ({
                     `}
                   >
                     <span className="select-none">{emoji}</span>
-                    {users.length > 1 && (
-                      <span className="text-xs font-medium">{users.length}</span>
+                    {(emojiCounts[emoji] ?? users.length) > 1 && (
+                      <span className="text-xs font-medium">{emojiCounts[emoji] ?? users.length}</span>
                     )}
                   </button>
                 ))}
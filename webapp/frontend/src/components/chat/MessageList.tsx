@@ -17,6 +17,7 @@ interface MessageData {
   channel_id: string;
   created_at: string;
   emojis: { [key: string]: string[] };
+  emoji_counts?: { [key: string]: number };
   file: FileInfo | null;
   parent_id: string | null;
   replies_count: number;
@@ -150,6 +151,7 @@ const MessageList: React.FC<MessageListProps> = ({
                   channelId={channelId}
                   createdAt={message.created_at}
                   emojis={message.emojis}
+                  emojiCounts={message.emoji_counts}
                   file={message.file}
                   repliesCount={message.replies_count}
                   onAddReaction={onAddReaction}
@@ -4,7 +4,12 @@ import { API_BASE_URL } from './BackendConfig';
 
 interface ApiContextType {
   // Messages
-  getChannelMessages: (channelId: string) => Promise<any[]>;
+  // Returns a page of messages; pass its prev_cursor as beforeId for older ones
+  getChannelMessages: (channelId: string, beforeId?: number) => Promise<{
+    messages: any[];
+    next_cursor: number | null;
+    prev_cursor: number | null;
+  }>;
   sendMessage: (channelId: string, content: string) => Promise<any>;
   deleteMessage: (messageId: string) => Promise<void>;
 
@@ -65,8 +70,9 @@ export const ApiProvider: React.FC<{ children: React.ReactNode }> = ({ children
 
   const api: ApiContextType = {
     // Messages
-    getChannelMessages: async (channelId) => {
-      const response = await fetchApi(`/messages/channel/${channelId}`);
+    getChannelMessages: async (channelId, beforeId) => {
+      const query = beforeId !== undefined ? `?before_id=${beforeId}` : '';
+      const response = await fetchApi(`/messages/channel/${channelId}${query}`);
       return response.json();
     },
 
@@ -60,7 +60,9 @@ export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ chi
         }
       });
       if (response.ok) {
-        const channelMessages = await response.json();
+        const data = await response.json();
+        // Channel history is paginated; DM history is still a plain list
+        const channelMessages = Array.isArray(data) ? data : data.messages;
         setMessages(prev => ({
           ...prev,
           [channelName]: channelMessages